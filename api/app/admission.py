@@ -0,0 +1,156 @@
+"""高コストなエンドポイントのアドミッション制御。
+
+画像生成を伴うルートはインスタンスあたりの同時実行数を制限し、待ち行列の
+推定待ち時間が予算を超える場合は Retry-After 付きの 503 を即座に返す。
+/health や GET /game/{id} などの軽いルートは制限の対象外。
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import (
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_BUDGET_S,
+    per_worker,
+)
+
+logger = logging.getLogger(__name__)
+
+# (method, path pattern) — 画像生成や複数回のモデル呼び出しを伴うルート
+EXPENSIVE_ROUTES: list[tuple[str, re.Pattern[str]]] = [
+    ("POST", re.compile(r"^/game/[^/]+/turn/?$")),
+    ("POST", re.compile(r"^/game/[^/]+/turn/burst/?$")),
+    ("POST", re.compile(r"^/game/[^/]+/avatar/?$")),
+    ("POST", re.compile(r"^/game/[^/]+/photos/[^/]+/ghost/?$")),
+    ("POST", re.compile(r"^/gemini/generate-image/?$")),
+]
+
+# サービス時間の指数移動平均の重み
+_EWMA_ALPHA = 0.2
+
+
+def is_expensive(method: str, path: str) -> bool:
+    return any(method == m and p.match(path) for m, p in EXPENSIVE_ROUTES)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """同時実行数の上限と待ち時間予算にもとづいてリクエストを受け入れる。"""
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_budget_s: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_budget_s = queue_budget_s
+        self._sem = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.service_time_s: float | None = None
+
+    def estimated_wait(self) -> float:
+        """新しいリクエストが実行開始されるまでの推定待ち時間 (秒)。"""
+        ahead = self.in_flight + self.queued
+        if ahead < self.max_in_flight or self.service_time_s is None:
+            return 0.0
+        waves = math.ceil((ahead + 1 - self.max_in_flight) / self.max_in_flight)
+        return waves * self.service_time_s
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.service_time_s or 1))
+
+    async def acquire(self) -> None:
+        # release() 直後は待機者がまだ in_flight に計上されていないため queued も含めて判定する
+        if self.in_flight + self.queued >= self.max_in_flight and (
+            self.queued >= self.max_queue
+            or self.estimated_wait() > self.queue_budget_s
+        ):
+            self.rejected += 1
+            raise AdmissionRejected(self._retry_after())
+
+        self.queued += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self, elapsed_s: float) -> None:
+        self.in_flight -= 1
+        self._sem.release()
+        if self.service_time_s is None:
+            self.service_time_s = elapsed_s
+        else:
+            self.service_time_s += _EWMA_ALPHA * (elapsed_s - self.service_time_s)
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "service_time_s": self.service_time_s,
+            "estimated_wait_s": self.estimated_wait(),
+        }
+
+
+# 制御はワーカーごとなので、インスタンス全体の上限をワーカー数で分ける
+controller = AdmissionController(
+    max_in_flight=per_worker(ADMISSION_MAX_IN_FLIGHT),
+    max_queue=per_worker(ADMISSION_MAX_QUEUE),
+    queue_budget_s=ADMISSION_QUEUE_BUDGET_S,
+)
+
+
+class AdmissionMiddleware:
+    """高コストなルートだけを AdmissionController に通す ASGI ミドルウェア。"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not is_expensive(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire()
+        except AdmissionRejected as e:
+            logger.warning(
+                "Shedding %s %s (in_flight=%d queued=%d)",
+                scope["method"],
+                scope["path"],
+                self.controller.in_flight,
+                self.controller.queued,
+            )
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry later"},
+                status_code=503,
+                headers={
+                    "Retry-After": str(e.retry_after),
+                    "X-Queue-Depth": str(self.controller.queued),
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
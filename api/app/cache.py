@@ -0,0 +1,170 @@
+"""TTL 付きキャッシュ。
+
+既定ではプロセス内の LRU (TTLCache)。SHARED_CACHE_PATH を設定すると、同じインスタンスの
+全ワーカープロセスが 1 つの SQLite ファイル (/dev/shm などのメモリ上に置く) を共有する
+SharedCache になり、ワーカー数だけキャッシュを重複して持たずに済む。
+値は JSON にできるものに限る。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.config import SHARED_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# SharedCache はイベントループ上で同期的に呼ばれるので、ロック待ちはごく短くする
+_BUSY_TIMEOUT_S = 0.005
+
+
+def make_key(*parts: Any) -> str:
+    """任意の値の組からキャッシュキー (sha256) を作る。"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(repr(part).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class TTLCache:
+    """最大件数と有効期限つきの LRU キャッシュ。"""
+
+    def __init__(self, maxsize: int, ttl_s: float):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any | None:
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            self._data.pop(key, None)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl_s: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + (ttl_s or self.ttl_s))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class SharedCache:
+    """ワーカープロセス間で共有する SQLite バックエンドのキャッシュ。
+
+    TTLCache と同じインターフェースを持つ。SQLite のエラーはキャッシュミスとして扱い、
+    リクエストを失敗させない。他のワーカーが書き込み中でロックが取れない場合も
+    待たずにミス (書き込みは捨てる) とする。
+    """
+
+    def __init__(self, path: str, namespace: str, maxsize: int, ttl_s: float):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.locked = 0
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=_BUSY_TIMEOUT_S, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))"
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Any | None:
+        try:
+            row = (
+                self._conn()
+                .execute(
+                    "SELECT value FROM cache"
+                    " WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (self.namespace, key, time.time()),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            self._failed(e, "read")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_s: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now + (ttl_s or self.ttl_s)),
+            )
+            # 期限切れを掃除し、上限を超えた分は期限の近いものから捨てる
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND (expires_at <= ? OR key IN ("
+                " SELECT key FROM cache WHERE namespace = ?"
+                " ORDER BY expires_at DESC LIMIT -1 OFFSET ?))",
+                (self.namespace, now, self.namespace, self.maxsize),
+            )
+        except sqlite3.Error as e:
+            self._failed(e, "write")
+
+    def _failed(self, error: sqlite3.Error, op: str) -> None:
+        if isinstance(error, sqlite3.OperationalError) and "locked" in str(error):
+            self.locked += 1
+            return
+        logger.error("Shared cache %s failed", op, exc_info=error)
+
+    def snapshot(self) -> dict:
+        try:
+            (size,) = (
+                self._conn()
+                .execute(
+                    "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            size = None
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "locked": self.locked,
+            "shared": True,
+        }
+
+
+def make_cache(namespace: str, maxsize: int, ttl_s: float) -> TTLCache | SharedCache:
+    """SHARED_CACHE_PATH が設定されていればワーカー間で共有するキャッシュを返す。"""
+    if SHARED_CACHE_PATH:
+        return SharedCache(SHARED_CACHE_PATH, namespace, maxsize, ttl_s)
+    return TTLCache(maxsize, ttl_s)
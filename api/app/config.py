@@ -5,3 +5,82 @@ load_dotenv()
 
 GEMINI_API_KEY = os.environ["GEMINI_API_KEY"]
 FIREBASE_STORAGE_BUCKET = os.environ["FIREBASE_STORAGE_BUCKET"]
+
+# uvicorn のワーカー数 (Dockerfile が CPU 数を設定する)。
+# ADMISSION_* と IMAGE_WORKERS はインスタンス全体の値で、ワーカーごとに per_worker() で割って使う
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def per_worker(total: int) -> int:
+    """インスタンス全体の上限をワーカー 1 つあたりの値にする (最低 1)。"""
+    return max(1, total // WEB_CONCURRENCY)
+
+
+# 高コストなエンドポイント (画像生成) のアドミッション制御
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_BUDGET_S = float(os.getenv("ADMISSION_QUEUE_BUDGET_S", "30"))
+
+# サムネイル / プレビューの形式 ("webp" | "avif")
+DERIVATIVE_FORMAT = os.getenv("DERIVATIVE_FORMAT", "webp")
+
+# Gemini が返した画像 (幽霊 / アバター) の保存形式 ("webp" | "jpg" | "avif")
+GENERATED_IMAGE_FORMAT = os.getenv("GENERATED_IMAGE_FORMAT", "webp")
+GENERATED_IMAGE_QUALITY = int(os.getenv("GENERATED_IMAGE_QUALITY", "85"))
+
+# 画像エンコード用プロセスプールのワーカー数
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+# 何イベントごとにタイムラインのスナップショットを書くか
+TIMELINE_SNAPSHOT_INTERVAL = int(os.getenv("TIMELINE_SNAPSHOT_INTERVAL", "20"))
+
+# 複数回モデルに渡す画像を Gemini Files API 経由で参照渡しにするか
+GEMINI_FILES_API = os.getenv("GEMINI_FILES_API", "true").lower() in ("1", "true", "yes")
+
+# ターン処理エンジン ("two_call": 検出と合成を別々に呼ぶ | "fused": 画像モデル 1 回で両方)
+TURN_ENGINE = os.getenv("TURN_ENGINE", "two_call")
+# fused エンジンの判定を Vision 専用モデルでも検証するターンの割合 (0-1)
+TURN_ENGINE_SHADOW_RATE = float(os.getenv("TURN_ENGINE_SHADOW_RATE", "0"))
+
+# ライブビューファインダーで直近のフレームを判定させる間隔 (秒)
+LIVE_DETECT_INTERVAL_S = float(os.getenv("LIVE_DETECT_INTERVAL_S", "1.5"))
+
+# temperature=0 の /gemini/generate 応答をキャッシュする件数と有効期限 (0 で無効)
+GENERATE_CACHE_SIZE = int(os.getenv("GENERATE_CACHE_SIZE", "256"))
+GENERATE_CACHE_TTL_S = float(os.getenv("GENERATE_CACHE_TTL_S", "3600"))
+
+# ワーカープロセス間で共有するキャッシュの SQLite ファイル (例: /dev/shm/game-api-cache.sqlite)。
+# 未設定ならキャッシュはプロセスごとに持つ
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+
+# 保持期間 (日)。solved のゲームは最終更新から RETENTION_SOLVED_DAYS、
+# それ以外 (放置されたゲーム) は RETENTION_ABANDONED_DAYS で削除対象になる
+RETENTION_SOLVED_DAYS = float(os.getenv("RETENTION_SOLVED_DAYS", "30"))
+RETENTION_ABANDONED_DAYS = float(os.getenv("RETENTION_ABANDONED_DAYS", "14"))
+# /storage/upload で置かれた uploads/ 以下のオブジェクトの保持期間 (日)
+RETENTION_UPLOADS_DAYS = float(os.getenv("RETENTION_UPLOADS_DAYS", "7"))
+
+# ZIP エクスポートで GCS から同時にダウンロードする (先読みする) 画像の数
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "8"))
+
+# 画像生成のフォールバック先 (速い順ではなく試す順、カンマ区切り)。各ルートの主モデルの次に試す
+IMAGE_FALLBACK_MODELS = [
+    m.strip()
+    for m in os.getenv("IMAGE_FALLBACK_MODELS", "gemini-2.5-flash-image").split(",")
+    if m.strip()
+]
+# 1 つのモデルの応答を待つ時間 (秒)。超えたら次のモデルに切り替える
+IMAGE_TIER_DEADLINE_S = float(os.getenv("IMAGE_TIER_DEADLINE_S", "25"))
+# true なら期限を過ぎても前のモデルの呼び出しを止めず、次のモデルと並行させて先に返った方を使う
+IMAGE_HEDGE = os.getenv("IMAGE_HEDGE", "false").lower() in ("1", "true", "yes")
+# 直近の失敗 (エラー・画像なし・期限切れ) の割合がこれを超えたモデルは飛ばす
+IMAGE_TIER_MAX_ERROR_RATE = float(os.getenv("IMAGE_TIER_MAX_ERROR_RATE", "0.5"))
+
+# 設定するとリクエストごとのタイミング・サイズ・バックエンド呼び出しをこのファイルに JSONL で追記する
+# (bench/replay.py で再生する)。未設定なら記録しない
+TRACE_RECORD_PATH = os.getenv("TRACE_RECORD_PATH", "")
+# 記録するリクエストの割合 (0-1)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+# ゲーム ID や本文のフィンガープリントに使う鍵。未設定ならプロセスごとのランダム値
+# (複数ワーカーで同じゲームを同じキーにまとめるには設定する)
+TRACE_SALT = os.getenv("TRACE_SALT", "")
@@ -0,0 +1,114 @@
+"""ゲームのアルバム (写真と幽霊画像) の ZIP エクスポート。
+
+アーカイブ全体をメモリに組み立てず、ZIP のエントリを書いた端からストリームで返す。
+出力先はシークできないので、各エントリはデータディスクリプタ付きで書かれる。
+画像は既に圧縮済みなので無圧縮 (ZIP_STORED) で格納する。
+GCS からのダウンロードは EXPORT_CONCURRENCY 件先読みするが、それ以上は取りに行かないため、
+メモリ使用量は写真の枚数ではなく先読み数 × 画像サイズで頭打ちになる。
+"""
+
+import asyncio
+import json
+import logging
+import zipfile
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator
+
+from fastapi.encoders import jsonable_encoder
+from google.api_core import exceptions as gexc
+
+from app.config import EXPORT_CONCURRENCY
+from app.firebase import bucket
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+class _Sink:
+    """ZipFile の書き込み先。書かれたバイト列を溜めておき、取り出すたびに空にする。
+
+    tell/seek を持たないので、ZipFile はシークできないストリームとして扱う。
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _entry_name(game_id: str, path: str) -> str:
+    """GCS のパスから games/{id}/ を除いたものを ZIP 内の名前にする。"""
+    return path.removeprefix(f"games/{game_id}/")
+
+
+def _zip_info(name: str, modified: datetime | None) -> zipfile.ZipInfo:
+    date_time = modified.timetuple()[:6] if modified else (1980, 1, 1, 0, 0, 0)
+    info = zipfile.ZipInfo(name, date_time=date_time)
+    info.compress_type = zipfile.ZIP_STORED
+    return info
+
+
+def _download(path: str) -> bytes | None:
+    try:
+        return bucket.blob(path).download_as_bytes()
+    except gexc.NotFound:
+        logger.warning("Export: missing object %s", path)
+        return None
+
+
+async def stream_zip(game_id: str, photos: list[dict]) -> AsyncIterator[bytes]:
+    """photos (id 付きの photos レコード) の画像と manifest.json を ZIP にして返す。"""
+    files = [
+        (path, photo.get("created_at"))
+        for photo in photos
+        for path in (photo.get("original_path"), photo.get("ghost_path"))
+        if path
+    ]
+    missing: list[str] = []
+    sink = _Sink()
+    pending: deque[tuple[str, datetime | None, asyncio.Task]] = deque()
+    queue = iter(files)
+
+    def fill() -> None:
+        for path, modified in queue:
+            task = asyncio.create_task(asyncio.to_thread(_download, path))
+            pending.append((path, modified, task))
+            if len(pending) >= EXPORT_CONCURRENCY:
+                return
+
+    try:
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+            fill()
+            while pending:
+                path, modified, task = pending.popleft()
+                data = await task
+                fill()
+                if data is None:
+                    missing.append(path)
+                    continue
+                zf.writestr(_zip_info(_entry_name(game_id, path), modified), data)
+                del data
+                yield sink.drain()
+
+            manifest = {"game_id": game_id, "photos": photos, "missing": missing}
+            zf.writestr(
+                _zip_info(MANIFEST_NAME, None),
+                json.dumps(jsonable_encoder(manifest), ensure_ascii=False, indent=2),
+            )
+        yield sink.drain()
+    finally:
+        # クライアントが途中で切断した場合は先読み中のダウンロードを捨てる
+        for _, _, task in pending:
+            task.cancel()
@@ -0,0 +1,105 @@
+"""ゲームごとの変更フィード。
+
+購読者が 1 人以上いるゲームについて、`games/{id}/events` への Firestore スナップショット
+リスナーを 1 つだけ張り、追記されたイベントを全購読者のキューに配る。
+購読者がいなくなればリスナーを外す。クライアントが何人いても Firestore の読み取りは
+ゲームごとに 1 系統で済む。
+"""
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from app.firebase import db
+
+logger = logging.getLogger(__name__)
+
+# 購読開始直前に届いたイベントを取りこぼさないよう保持しておく件数
+_RECENT_EVENTS = 50
+# 購読者ごとのキューの上限 (溢れた購読者は切断し、再接続で状態を取り直させる)
+_QUEUE_SIZE = 100
+
+# キューの終端 (購読者が遅すぎて切り離された)
+OVERFLOW = None
+
+
+class _GameFeed:
+    def __init__(self, game_id: str, after_event_id: str | None):
+        self.game_id = game_id
+        self.loop = asyncio.get_running_loop()
+        self.subscribers: set[asyncio.Queue] = set()
+        self.recent: deque[dict] = deque(maxlen=_RECENT_EVENTS)
+
+        events_ref = db.collection("games").document(game_id).collection("events")
+        query = events_ref.order_by("__name__")
+        if after_event_id:
+            query = query.where("__name__", ">", events_ref.document(after_event_id))
+        self.watch = query.on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Firestore のリスナースレッドから呼ばれる
+        events = sorted(
+            (
+                {"id": change.document.id, **change.document.to_dict()}
+                for change in changes
+                if change.type.name == "ADDED"
+            ),
+            key=lambda e: e["id"],
+        )
+        if events:
+            self.loop.call_soon_threadsafe(self._publish, events)
+
+    def _publish(self, events: list[dict]) -> None:
+        for event in events:
+            if self.recent and event["id"] <= self.recent[-1]["id"]:
+                continue
+            self.recent.append(event)
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    logger.warning("Dropping slow subscriber of game %s", self.game_id)
+                    self.subscribers.discard(queue)
+                    queue.get_nowait()
+                    queue.put_nowait(OVERFLOW)
+
+    def close(self) -> None:
+        self.watch.unsubscribe()
+
+
+_feeds: dict[str, _GameFeed] = {}
+
+
+@asynccontextmanager
+async def subscribe(
+    game_id: str, after_event_id: str | None
+) -> AsyncIterator[asyncio.Queue]:
+    """after_event_id より後にゲームに追記されるイベントを受け取るキューを返す。
+
+    キューから OVERFLOW (None) が出てきたら購読は打ち切られている。
+    """
+    feed = _feeds.get(game_id)
+    if feed is None:
+        feed = _feeds[game_id] = _GameFeed(game_id, after_event_id)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    for event in feed.recent:
+        if after_event_id is None or event["id"] > after_event_id:
+            queue.put_nowait(event)
+    feed.subscribers.add(queue)
+    try:
+        yield queue
+    finally:
+        feed.subscribers.discard(queue)
+        if not feed.subscribers and _feeds.get(game_id) is feed:
+            del _feeds[game_id]
+            feed.close()
+
+
+def snapshot() -> dict:
+    return {
+        "games": len(_feeds),
+        "subscribers": sum(len(f.subscribers) for f in _feeds.values()),
+    }
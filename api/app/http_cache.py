@@ -0,0 +1,57 @@
+"""読み取り系エンドポイントの HTTP キャッシュ (ETag / Cache-Control / 304)。
+
+ETag はレスポンス本体ではなくドキュメントの版 (updated_at など) から作るので、
+304 を返す場合は Pydantic モデルの組み立ても JSON シリアライズも行わない。
+"""
+
+import hashlib
+import json
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+# ルートごとの Cache-Control
+STATIC = "public, max-age=3600"  # 実行中に変わらないシナリオデータ
+REVALIDATE = "no-cache"  # キャッシュしてよいが毎回 ETag で再検証する
+
+
+def dumps(obj: Any) -> bytes:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json().encode()
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def etag_for(*parts: Any) -> str:
+    """版を表す値の組から強い ETag を作る。"""
+    digest = hashlib.sha256("\0".join(map(str, parts)).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match は弱い比較 (W/ を無視) で判定する
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def respond(
+    request: Request,
+    etag: str,
+    cache_control: str,
+    body: bytes | Callable[[], Any],
+) -> Response:
+    """If-None-Match が一致すれば 304、そうでなければ JSON を返す。
+
+    body には事前にシリアライズしたバイト列か、本体を組み立てる関数を渡す
+    (関数は 304 のときは呼ばれない)。
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content = body if isinstance(body, bytes) else dumps(body())
+    return Response(content=content, media_type="application/json", headers=headers)
@@ -0,0 +1,172 @@
+"""画像の再エンコード・派生物生成と GCS への保存。
+
+CPU を使うエンコード処理はプロセスプールで実行し、イベントループを塞がない。
+プールは spawn で起動するため、ワーカーは app.images (Pillow のみ) だけを読み込む。
+"""
+
+import asyncio
+import logging
+import mimetypes
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from app import images
+from app.config import (
+    DERIVATIVE_FORMAT,
+    GENERATED_IMAGE_FORMAT,
+    GENERATED_IMAGE_QUALITY,
+    IMAGE_WORKERS,
+    per_worker,
+)
+from app.firebase import bucket
+
+logger = logging.getLogger(__name__)
+
+_pool: Executor | None = None
+
+
+def _get_pool() -> Executor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            # プールは uvicorn ワーカーごとにできるので、合計が IMAGE_WORKERS になるよう分ける
+            max_workers=per_worker(IMAGE_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def start() -> None:
+    """プールを起動し、各ワーカーの spawn と import を済ませておく。
+
+    遅延起動だと各 uvicorn ワーカーの最初の画像リクエストがその待ち時間を負うため、
+    app の lifespan から呼ぶ。
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    fmt = images.supported_format(DERIVATIVE_FORMAT)
+    # 同時に投げるとアイドルなワーカーがないので、ワーカー数だけプロセスが起動する
+    await asyncio.gather(
+        *(
+            loop.run_in_executor(pool, images.warm_up, fmt)
+            for _ in range(per_worker(IMAGE_WORKERS))
+        )
+    )
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_pool(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), fn, *args)
+
+
+def guess_mime_type(path: str, default: str = "image/png") -> str:
+    return mimetypes.guess_type(path)[0] or default
+
+
+def _derivative_path(source_path: str, name: str, ext: str) -> str:
+    base = source_path.rsplit(".", 1)[0]
+    return f"{base}_{name}.{ext}"
+
+
+def _upload(path: str, image: images.EncodedImage) -> str:
+    blob = bucket.blob(path)
+    blob.upload_from_string(image.data, content_type=image.mime_type)
+    blob.make_public()
+    return blob.public_url
+
+
+async def _upload_derivatives(
+    source_path: str, derivatives: list[images.EncodedImage], prefix: str
+) -> dict[str, str]:
+    urls = await asyncio.gather(
+        *(
+            asyncio.to_thread(_upload, _derivative_path(source_path, d.name, d.ext), d)
+            for d in derivatives
+        )
+    )
+    return {f"{prefix}{d.name}_url": url for d, url in zip(derivatives, urls)}
+
+
+async def store_derivatives(source_path: str, data: bytes, prefix: str = "") -> dict[str, str]:
+    """派生物を生成して source_path の隣に保存し、{"<prefix>thumbnail_url": url, ...} を返す。
+
+    失敗しても呼び出し元の処理は止めず、空の dict を返す。
+    """
+    try:
+        fmt = images.supported_format(DERIVATIVE_FORMAT)
+        derivatives = await run_in_pool(images.build_derivatives, data, fmt)
+        return await _upload_derivatives(source_path, derivatives, prefix)
+    except Exception:
+        logger.exception("Failed to build derivatives for %s", source_path)
+        return {}
+
+
+@dataclass
+class StoredImage:
+    path: str
+    url: str
+    mime_type: str
+    original_bytes: int
+    stored_bytes: int
+    derivative_urls: dict[str, str] = field(default_factory=dict)
+
+
+async def store_generated_image(
+    base_path: str,
+    data: bytes,
+    mime_type: str,
+    derivative_prefix: str | None = None,
+) -> StoredImage:
+    """Gemini が返した画像を再エンコードして `{base_path}.{ext}` に保存する。
+
+    derivative_prefix を指定すると、同じデコード結果からサムネイルとプレビューも作る。
+    再エンコードに失敗した場合は元の画像をそのまま保存する。
+    """
+    derivative_fmt = (
+        images.supported_format(DERIVATIVE_FORMAT) if derivative_prefix is not None else None
+    )
+    try:
+        encoded, derivatives = await run_in_pool(
+            images.transcode,
+            data,
+            mime_type,
+            images.supported_format(GENERATED_IMAGE_FORMAT),
+            GENERATED_IMAGE_QUALITY,
+            derivative_fmt,
+        )
+    except Exception:
+        logger.exception("Failed to transcode generated image for %s", base_path)
+        encoded = images.EncodedImage("main", data, mime_type, images.ext_for(mime_type))
+        derivatives = []
+
+    path = f"{base_path}.{encoded.ext}"
+    url = await asyncio.to_thread(_upload, path, encoded)
+    derivative_urls = (
+        await _upload_derivatives(path, derivatives, derivative_prefix or "")
+        if derivatives
+        else {}
+    )
+
+    logger.info(
+        "Stored %s: %d -> %d bytes (%.0f%% saved)",
+        path,
+        len(data),
+        len(encoded.data),
+        100 * (1 - len(encoded.data) / len(data)) if data else 0,
+    )
+    return StoredImage(
+        path=path,
+        url=url,
+        mime_type=encoded.mime_type,
+        original_bytes=len(data),
+        stored_bytes=len(encoded.data),
+        derivative_urls=derivative_urls,
+    )
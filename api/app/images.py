@@ -0,0 +1,104 @@
+"""Pillow による画像変換。
+
+ここの関数はプロセスプールのワーカーからも呼ばれるため、Firebase や Gemini の
+クライアントを import しない (spawn されたワーカーで初期化が走らないようにする)。
+GCS への保存は app.image_store が行う。
+"""
+
+import io
+from dataclasses import dataclass
+
+from PIL import Image, ImageOps, features
+
+# (派生物名, 長辺の最大 px, 品質)
+DERIVATIVE_SIZES = [
+    ("thumbnail", 320, 70),
+    ("preview", 1280, 80),
+]
+
+_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "avif": ("AVIF", "image/avif"),
+    "jpg": ("JPEG", "image/jpeg"),
+}
+
+
+@dataclass
+class EncodedImage:
+    name: str
+    data: bytes
+    mime_type: str
+    ext: str
+
+
+def ext_for(mime_type: str) -> str:
+    for fmt, (_, mime) in _FORMATS.items():
+        if mime == mime_type:
+            return fmt
+    return "png" if "png" in mime_type else "jpg"
+
+
+def supported_format(fmt: str) -> str:
+    """この Pillow ビルドで使えない形式なら WebP にフォールバックする。"""
+    if fmt == "avif" and not features.check("avif"):
+        return "webp"
+    return fmt if fmt in _FORMATS else "webp"
+
+
+def _decode(data: bytes) -> Image.Image:
+    with Image.open(io.BytesIO(data)) as src:
+        image = ImageOps.exif_transpose(src)
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _encode(image: Image.Image, name: str, fmt: str, quality: int) -> EncodedImage:
+    """メタデータ (EXIF / ICC / テキストチャンク) は引き継がずにエンコードする。"""
+    pil_format, mime_type = _FORMATS[fmt]
+    options: dict = {"quality": quality}
+    if fmt == "webp":
+        options["method"] = 4
+    elif fmt == "jpg":
+        options["optimize"] = True
+        options["progressive"] = True
+        if image.mode == "RGBA":
+            image = image.convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format=pil_format, **options)
+    return EncodedImage(name, out.getvalue(), mime_type, fmt)
+
+
+def _derivatives(image: Image.Image, fmt: str) -> list[EncodedImage]:
+    derivatives = []
+    for name, max_px, quality in DERIVATIVE_SIZES:
+        resized = image.copy()
+        resized.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        derivatives.append(_encode(resized, name, fmt, quality))
+    return derivatives
+
+
+def build_derivatives(data: bytes, fmt: str) -> list[EncodedImage]:
+    """画像バイト列からサムネイルとプレビューを生成する。"""
+    return _derivatives(_decode(data), fmt)
+
+
+def transcode(
+    data: bytes, mime_type: str, fmt: str, quality: int, derivative_fmt: str | None = None
+) -> tuple[EncodedImage, list[EncodedImage]]:
+    """生成画像を fmt に再エンコードし、必要なら派生物も同じデコード結果から作る。
+
+    再エンコードの方が大きくなる場合は元のバイト列をそのまま返す。
+    """
+    image = _decode(data)
+    encoded = _encode(image, "main", fmt, quality)
+    if len(encoded.data) >= len(data):
+        encoded = EncodedImage("main", data, mime_type, ext_for(mime_type))
+    derivatives = _derivatives(image, derivative_fmt) if derivative_fmt else []
+    return encoded, derivatives
+
+
+def warm_up(fmt: str) -> None:
+    """プールのワーカーで Pillow とエンコーダを読み込ませておく (起動時に呼ぶ)。"""
+    _encode(Image.new("RGB", (8, 8)), "warm_up", fmt, 50)
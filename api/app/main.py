@@ -1,10 +1,38 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import game, gemini, live, photo, scenario, storage, turn
+from app import game_feed, image_store, metrics, model_router, recorder
+from app.admission import AdmissionMiddleware, controller
+from app.config import TRACE_RECORD_PATH
+from app.routers import (
+    game,
+    gemini,
+    live,
+    photo,
+    scenario,
+    storage,
+    timeline,
+    turn,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await image_store.start()
+    yield
+    image_store.shutdown()
 
-app = FastAPI(title="Game API")
 
+app = FastAPI(title="Game API", lifespan=lifespan)
+
+# CORS より内側に置き、503 にも CORS ヘッダが付くようにする
+app.add_middleware(AdmissionMiddleware)
+if TRACE_RECORD_PATH:
+    # アドミッションの待ち時間や 503 も含めて記録する
+    recorder.instrument()
+    app.add_middleware(recorder.RecorderMiddleware, path=TRACE_RECORD_PATH)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -19,9 +47,24 @@ app.include_router(live.router)
 app.include_router(storage.router)
 app.include_router(photo.router)
 app.include_router(scenario.router)
+app.include_router(timeline.router)
 app.include_router(turn.router)
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "admission": controller.snapshot()}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """ターンエンジンの A/B 比較用カウンタなど (プロセス単位)。"""
+    return {
+        "admission": controller.snapshot(),
+        "turn_engines": {
+            name: stats.snapshot() for name, stats in metrics.turn_engines.items()
+        },
+        "generate_cache": gemini.generate_cache.snapshot(),
+        "game_feeds": game_feed.snapshot(),
+        "image_models": model_router.snapshot(),
+    }
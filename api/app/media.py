@@ -0,0 +1,88 @@
+"""Gemini Files API を使った画像の参照ハンドル。
+
+同じ画像を複数回モデルに渡す場合 (ターン写真を Vision 検出と Ghost 合成の両方に
+渡す、アバターを毎ターンの Ghost 合成に渡す) に、インラインで毎回 base64 化して
+送る代わりに一度だけアップロードし、以降は file URI で参照する。
+アバターのハンドルはゲームごとに有効期限までキャッシュする (SHARED_CACHE_PATH を
+設定するとワーカー間で共有され、ワーカーごとに同じアバターを再アップロードしない)。
+"""
+
+import io
+import logging
+from datetime import datetime, timedelta, timezone
+
+from google.genai import types
+
+from app.cache import make_cache
+from app.config import GEMINI_FILES_API
+from app.firebase import bucket
+from app.gemini import client
+from app.image_store import guess_mime_type
+
+logger = logging.getLogger(__name__)
+
+# 期限ぎりぎりのハンドルは使わない
+_EXPIRY_MARGIN = timedelta(hours=1)
+# expiration_time が返らなかった場合の想定寿命 (Files API の保持期間は 48 時間)
+_DEFAULT_TTL = timedelta(hours=47)
+
+# avatar_url -> {"uri", "mime_type"} (アバターは再生成のたびに別の URL になる)
+_avatar_handles = make_cache("avatar_handles", 1024, _DEFAULT_TTL.total_seconds())
+
+
+def _inline(data: bytes, mime_type: str) -> types.Part:
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+async def _upload(data: bytes, mime_type: str) -> tuple[types.Part, datetime]:
+    file = await client.aio.files.upload(
+        file=io.BytesIO(data),
+        config=types.UploadFileConfig(mime_type=mime_type),
+    )
+    expires_at = file.expiration_time or datetime.now(timezone.utc) + _DEFAULT_TTL
+    part = types.Part.from_uri(file_uri=file.uri, mime_type=file.mime_type or mime_type)
+    return part, expires_at
+
+
+async def image_part(data: bytes, mime_type: str) -> types.Part:
+    """複数回のモデル呼び出しで使う画像をアップロードし、参照 Part を返す。
+
+    Files API が無効、またはアップロードに失敗した場合はインライン Part を返す。
+    """
+    if not GEMINI_FILES_API:
+        return _inline(data, mime_type)
+    try:
+        part, _ = await _upload(data, mime_type)
+        return part
+    except Exception:
+        logger.exception("Files API upload failed; falling back to inline data")
+        return _inline(data, mime_type)
+
+
+async def avatar_part(avatar_url: str) -> types.Part:
+    """ゲームのアバター画像の Part を返す。アップロード済みなら期限まで再利用する。"""
+    cached = _avatar_handles.get(avatar_url)
+    if cached:
+        return types.Part.from_uri(
+            file_uri=cached["uri"], mime_type=cached["mime_type"]
+        )
+
+    avatar_blob_name = avatar_url.split(f"/{bucket.name}/")[-1]
+    avatar_bytes = bucket.blob(avatar_blob_name).download_as_bytes()
+    mime_type = guess_mime_type(avatar_blob_name)
+    if not GEMINI_FILES_API:
+        return _inline(avatar_bytes, mime_type)
+
+    try:
+        part, expires_at = await _upload(avatar_bytes, mime_type)
+    except Exception:
+        logger.exception("Files API upload failed; falling back to inline avatar")
+        return _inline(avatar_bytes, mime_type)
+    ttl = expires_at - _EXPIRY_MARGIN - datetime.now(timezone.utc)
+    if ttl.total_seconds() > 0:
+        _avatar_handles.set(
+            avatar_url,
+            {"uri": part.file_data.file_uri, "mime_type": part.file_data.mime_type},
+            ttl_s=ttl.total_seconds(),
+        )
+    return part
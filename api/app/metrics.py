@@ -0,0 +1,90 @@
+"""プロセス内のカウンタ。GET /metrics で参照する。"""
+
+import random
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, round(q * (len(sorted_values) - 1)))
+    return sorted_values[idx]
+
+
+@dataclass
+class TurnEngineStats:
+    """ターンエンジンごとの A/B 比較用カウンタ。"""
+
+    turns: int = 0
+    hits: int = 0
+    parse_failures: int = 0
+    fallbacks: int = 0
+    ghost_failures: int = 0
+    shadow_checks: int = 0
+    shadow_agreements: int = 0
+    latencies_s: deque = field(default_factory=lambda: deque(maxlen=500))
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies_s)
+        return {
+            "turns": self.turns,
+            "hit_rate": self.hits / self.turns if self.turns else None,
+            "parse_failures": self.parse_failures,
+            "fallbacks": self.fallbacks,
+            "ghost_failures": self.ghost_failures,
+            "shadow_checks": self.shadow_checks,
+            "shadow_agreement_rate": (
+                self.shadow_agreements / self.shadow_checks if self.shadow_checks else None
+            ),
+            "latency_p50_s": percentile(latencies, 0.50),
+            "latency_p95_s": percentile(latencies, 0.95),
+        }
+
+
+turn_engines: dict[str, TurnEngineStats] = defaultdict(TurnEngineStats)
+
+
+@dataclass
+class ModelStats:
+    """画像生成モデルごとの直近のレイテンシと成否。モデルの振り分けに使う。"""
+
+    calls: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    served: int = 0  # このモデルの応答が採用された回数
+    hedges: int = 0  # 期限切れ後も並行して走らせた回数
+    skipped: int = 0  # 不調と判断して飛ばした回数
+    latencies_s: deque = field(default_factory=lambda: deque(maxlen=200))
+    outcomes: deque = field(default_factory=lambda: deque(maxlen=50))
+
+    def record(self, ok: bool, latency_s: float) -> None:
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies_s.append(latency_s)
+
+    def error_rate(self) -> float | None:
+        if not self.outcomes:
+            return None
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies_s)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "served": self.served,
+            "hedges": self.hedges,
+            "skipped": self.skipped,
+            "error_rate": self.error_rate(),
+            "latency_p50_s": percentile(latencies, 0.50),
+            "latency_p95_s": percentile(latencies, 0.95),
+        }
+
+
+models: dict[str, ModelStats] = defaultdict(ModelStats)
+
+
+def sample(rate: float) -> bool:
+    return rate > 0 and random.random() < rate
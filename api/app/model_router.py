@@ -0,0 +1,189 @@
+"""画像生成モデルの振り分け (段階的フォールバックとヘッジ)。
+
+ルートごとに主モデルを持ち、その後ろに IMAGE_FALLBACK_MODELS を段として並べて上から試す。
+各段は IMAGE_TIER_DEADLINE_S 以内に画像を返さなければ次の段に切り替えるので、
+プロバイダ側が遅くなってもリクエストの所要時間は 期限 × 段数 で頭打ちになる。
+IMAGE_HEDGE を有効にすると期限を過ぎた段を止めずに次の段と並行させ、先に画像を返した方を使う。
+
+モデルごとの直近のレイテンシと失敗率は metrics.models に記録し、失敗 (エラー・画像なし・期限切れ)
+の割合が IMAGE_TIER_MAX_ERROR_RATE を超えた段は最初から飛ばす。飛ばした段にも一部の呼び出しを
+通して回復を確認する。
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from google.genai import types
+
+from app import metrics
+from app.config import (
+    IMAGE_FALLBACK_MODELS,
+    IMAGE_HEDGE,
+    IMAGE_TIER_DEADLINE_S,
+    IMAGE_TIER_MAX_ERROR_RATE,
+)
+from app.gemini import client
+
+logger = logging.getLogger(__name__)
+
+# ルートごとの主モデル (第 1 段)
+ROUTES = {
+    "turn": "gemini-3-pro-image-preview",
+    "photo_ghost": "gemini-2.0-flash-exp-image-generation",
+    "avatar": "nano-banana-pro-preview",
+    "generate_image": "nano-banana-pro-preview",
+}
+
+# 不調と判断するのに必要な直近の呼び出し数
+_MIN_SAMPLES = 10
+# 不調なモデルにも回復確認のために通す呼び出しの割合
+_PROBE_RATE = 0.1
+
+
+class NoImageError(RuntimeError):
+    pass
+
+
+class ModelRoutingError(RuntimeError):
+    """すべての段が失敗した。"""
+
+
+@dataclass
+class RoutedResponse:
+    response: types.GenerateContentResponse
+    model: str
+    tier: int  # 0 が主モデル
+
+
+def has_image(response: types.GenerateContentResponse) -> bool:
+    candidates = response.candidates or []
+    if not candidates or not candidates[0].content:
+        return False
+    return any(part.inline_data for part in candidates[0].content.parts or [])
+
+
+def tiers(route: str) -> list[str]:
+    primary = ROUTES[route]
+    return [primary] + [m for m in IMAGE_FALLBACK_MODELS if m != primary]
+
+
+def _unhealthy(model: str) -> bool:
+    stats = metrics.models[model]
+    error_rate = stats.error_rate()
+    return (
+        len(stats.outcomes) >= _MIN_SAMPLES
+        and error_rate is not None
+        and error_rate > IMAGE_TIER_MAX_ERROR_RATE
+    )
+
+
+def _plan(route: str) -> list[tuple[int, str]]:
+    """試す段の (段番号, モデル) を返す。不調な段は飛ばすが、全部は飛ばさない。"""
+    planned = []
+    for tier, model in enumerate(tiers(route)):
+        if _unhealthy(model) and not metrics.sample(_PROBE_RATE):
+            metrics.models[model].skipped += 1
+            continue
+        planned.append((tier, model))
+    return planned or list(enumerate(tiers(route)))
+
+
+async def _call(
+    model: str, contents, config: types.GenerateContentConfig
+) -> types.GenerateContentResponse:
+    stats = metrics.models[model]
+    stats.calls += 1
+    started = time.perf_counter()
+    try:
+        response = await client.aio.models.generate_content(
+            model=model, contents=contents, config=config
+        )
+        if not has_image(response):
+            raise NoImageError(f"{model} returned no image data")
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        stats.failures += 1
+        stats.record(False, time.perf_counter() - started)
+        raise
+    stats.record(True, time.perf_counter() - started)
+    return response
+
+
+def _timed_out(model: str) -> None:
+    stats = metrics.models[model]
+    stats.timeouts += 1
+    stats.record(False, IMAGE_TIER_DEADLINE_S)
+
+
+async def generate_image(
+    route: str, contents, config: types.GenerateContentConfig
+) -> RoutedResponse:
+    """route の段を順に (ヘッジ時は重ねて) 試し、最初に画像を返した応答を返す。
+
+    どの段も画像を返さなければ ModelRoutingError を送出する。
+    """
+    loop = asyncio.get_running_loop()
+    running: dict[asyncio.Task, tuple[int, str]] = {}
+    last_error: BaseException | None = None
+    try:
+        for tier, model in _plan(route):
+            task = asyncio.create_task(_call(model, contents, config))
+            running[task] = (tier, model)
+            deadline = loop.time() + IMAGE_TIER_DEADLINE_S
+
+            while running:
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=max(0.0, deadline - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for finished in done:
+                    done_tier, done_model = running.pop(finished)
+                    if finished.exception() is None:
+                        metrics.models[done_model].served += 1
+                        if done_tier > 0:
+                            logger.info("Image route %s served by %s", route, done_model)
+                        return RoutedResponse(finished.result(), done_model, done_tier)
+                    last_error = finished.exception()
+                    logger.warning(
+                        "Image model %s failed for %s: %s", done_model, route, last_error
+                    )
+
+            if task in running:
+                if IMAGE_HEDGE:
+                    metrics.models[model].hedges += 1
+                else:
+                    del running[task]
+                    task.cancel()
+                    _timed_out(model)
+                logger.warning(
+                    "Image model %s missed the %.0fs deadline for %s",
+                    model,
+                    IMAGE_TIER_DEADLINE_S,
+                    route,
+                )
+
+        for _, model in running.values():
+            _timed_out(model)
+        raise ModelRoutingError(f"All image models failed for {route}") from last_error
+    finally:
+        # 先に返った段があれば、残りの (ヘッジ中の) 呼び出しは捨てる
+        for task in running:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # 未回収の例外として警告されないように
+
+
+def snapshot() -> dict:
+    return {
+        "routes": {route: tiers(route) for route in ROUTES},
+        "deadline_s": IMAGE_TIER_DEADLINE_S,
+        "hedge": IMAGE_HEDGE,
+        "models": {model: stats.snapshot() for model, stats in metrics.models.items()},
+    }
@@ -0,0 +1,291 @@
+"""本番トラフィックの記録 (性能回帰テスト用のトレース)。
+
+TRACE_RECORD_PATH を設定したときだけ有効になり、HTTP リクエストと WebSocket セッションごとに
+1 行の JSON をそのファイルに追記する。記録するのは所要時間・ステータス・送受信バイト数と、
+その間に行われた Gemini / Firestore / GCS 呼び出しの開始時刻と所要時間だけで、
+本文や ID は TRACE_SALT 付きのハッシュ (フィンガープリント) にしか残さない。
+
+bench/replay.py がこのトレースからフェイクバックエンドのレイテンシを再現し、
+同じ到着パターンでアプリを駆動する。
+"""
+
+import collections.abc
+import contextvars
+import functools
+import hashlib
+import hmac
+import inspect
+import json
+import logging
+import os
+import secrets
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import metrics
+from app.config import TRACE_RECORD_PATH, TRACE_SALT, TRACE_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 記録しないパス (監視用)
+_SKIP_PATHS = {"/health", "/metrics"}
+
+# ワーカー間で同じゲームを同じキーにするには TRACE_SALT を揃える
+_SALT = TRACE_SALT.encode() or secrets.token_bytes(16)
+
+# 記録中のリクエストのバックエンド呼び出し [種別, 開始 (ms), 所要時間 (ms), 成否]
+_calls: contextvars.ContextVar[list | None] = contextvars.ContextVar(
+    "trace_calls", default=None
+)
+_started: contextvars.ContextVar[float] = contextvars.ContextVar(
+    "trace_started", default=0.0
+)
+# 計測済みの呼び出しの内側 (例: set() の中の batch.commit()) を二重に数えない
+_inside: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "trace_inside", default=False
+)
+
+
+def fingerprint(data: bytes | str, length: int = 16) -> str:
+    if isinstance(data, str):
+        data = data.encode()
+    return hmac.new(_SALT, data, hashlib.sha256).hexdigest()[:length]
+
+
+def _record_call(kind: str, started: float, ok: bool) -> None:
+    calls = _calls.get()
+    if calls is None:
+        return
+    now = time.perf_counter()
+    calls.append(
+        [
+            kind,
+            round((started - _started.get()) * 1000, 1),
+            round((now - started) * 1000, 1),
+            int(ok),
+        ]
+    )
+
+
+def _kind_for(kind: str, kwargs: dict) -> str:
+    # Gemini はモデルごとにレイテンシが大きく違うので種別に含める
+    return f"{kind}:{kwargs['model']}" if kind == "gemini" and "model" in kwargs else kind
+
+
+def _traced(fn, kind: str):
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if _calls.get() is None or _inside.get():
+                return await fn(*args, **kwargs)
+            token = _inside.set(True)
+            started = time.perf_counter()
+            call_kind = _kind_for(kind, kwargs)
+            ok = False
+            try:
+                result = await fn(*args, **kwargs)
+                ok = True
+            finally:
+                _inside.reset(token)
+                if not ok:
+                    _record_call(call_kind, started, ok)
+            if isinstance(result, collections.abc.AsyncIterator):
+                # generate_content_stream は読み切るまでを 1 回の呼び出しとする
+                return _traced_aiter(result, call_kind, started)
+            _record_call(call_kind, started, ok)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _calls.get() is None or _inside.get():
+            return fn(*args, **kwargs)
+        token = _inside.set(True)
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+        finally:
+            _inside.reset(token)
+            if not ok:
+                _record_call(kind, started, ok)
+        if isinstance(result, collections.abc.Iterator):
+            # stream() は (ネイティブでない) ジェネレータを返すので、読み切るまでを 1 回の呼び出しとする
+            return _traced_iter(result, kind, started)
+        _record_call(kind, started, ok)
+        return result
+
+    return wrapper
+
+
+def _traced_iter(iterator, kind: str, started: float):
+    ok = False
+    try:
+        yield from iterator
+        ok = True
+    except GeneratorExit:
+        ok = True  # 呼び出し側が途中でやめただけ
+        raise
+    finally:
+        _record_call(kind, started, ok)
+
+
+async def _traced_aiter(iterator, kind: str, started: float):
+    ok = False
+    try:
+        async for item in iterator:
+            yield item
+        ok = True
+    except GeneratorExit:
+        ok = True
+        raise
+    finally:
+        _record_call(kind, started, ok)
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+def _patch_class(cls: type, name: str, kind: str) -> None:
+    """cls (または name を定義している基底クラス) のメソッドを計測付きに差し替える。"""
+    owner = next((c for c in cls.__mro__ if name in c.__dict__), None)
+    if owner is None or getattr(owner.__dict__[name], "__traced__", False):
+        return
+    wrapped = _traced(owner.__dict__[name], kind)
+    wrapped.__traced__ = True
+    setattr(owner, name, wrapped)
+
+
+def instrument() -> None:
+    """Firestore / GCS / Gemini クライアントの呼び出しを計測する。
+
+    本物の SDK でもベンチ用のフェイクでも動くよう、実際のオブジェクトの型から差し替える。
+    """
+    from app.firebase import bucket, db
+    from app.gemini import client
+
+    collection = db.collection("_trace")
+    doc = collection.document("_trace")
+    for name in ("get", "set", "update", "delete"):
+        _patch_class(type(doc), name, "firestore_read" if name == "get" else "firestore_write")
+    _patch_class(type(collection.limit(1)), "stream", "firestore_read")
+    _patch_class(type(collection), "stream", "firestore_read")
+    _patch_class(type(db.batch()), "commit", "firestore_write")
+
+    blob = bucket.blob("_trace")
+    for name in ("upload_from_string", "upload_from_file", "make_public", "delete"):
+        _patch_class(type(blob), name, "gcs_upload")
+    _patch_class(type(blob), "download_as_bytes", "gcs_download")
+
+    models = client.aio.models
+    models.generate_content = _traced(models.generate_content, "gemini")
+    models.generate_content_stream = _traced(models.generate_content_stream, "gemini")
+    files = client.aio.files
+    files.upload = _traced(files.upload, "gemini_upload")
+
+
+class _TraceWriter:
+    """1 行ずつ O_APPEND で書くので、複数ワーカーが同じファイルに書いても行が混ざらない。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: int | None = None
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(self._fd, line.encode())
+        except OSError:
+            logger.exception("Failed to write trace record to %s", self.path)
+
+
+class RecorderMiddleware:
+    """リクエストごとのタイミング・サイズ・バックエンド呼び出しを JSONL に記録する。"""
+
+    def __init__(self, app: ASGIApp, path: str = TRACE_RECORD_PATH):
+        self.app = app
+        self.writer = _TraceWriter(path)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] not in ("http", "websocket")
+            or scope["path"] in _SKIP_PATHS
+            or not metrics.sample(TRACE_SAMPLE_RATE)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        record: dict = {
+            "t": round(time.time(), 3),
+            "kind": scope["type"],
+            "method": scope.get("method", "WS"),
+        }
+        headers = dict(scope.get("headers") or [])
+        # 条件付きリクエスト (ETag の再検証) かどうか。値はゲームごとに違うので記録しない
+        if b"if-none-match" in headers:
+            record["conditional"] = 1
+        digest = hmac.new(_SALT, digestmod=hashlib.sha256)
+        counts = {"req_bytes": 0, "resp_bytes": 0, "in_msgs": 0, "out_msgs": 0, "files": 0}
+        status = None
+        first_byte = None
+
+        async def traced_receive() -> Message:
+            message = await receive()
+            body = message.get("body") or message.get("bytes") or b""
+            text = message.get("text")
+            if text is not None:
+                body = text.encode()
+            if body:
+                counts["req_bytes"] += len(body)
+                counts["files"] += body.count(b'filename="')
+                digest.update(body)
+            if message["type"] == "websocket.receive":
+                counts["in_msgs"] += 1
+            return message
+
+        async def traced_send(message: Message) -> None:
+            nonlocal status, first_byte
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "websocket.accept":
+                status = 101
+            elif message["type"] == "websocket.close" and status is None:
+                status = 403
+            body = message.get("body") or message.get("bytes") or b""
+            if message.get("text") is not None:
+                body = message["text"].encode()
+            if body:
+                if first_byte is None:
+                    first_byte = time.perf_counter()
+                counts["resp_bytes"] += len(body)
+            if message["type"] == "websocket.send":
+                counts["out_msgs"] += 1
+            await send(message)
+
+        calls: list = []
+        calls_token = _calls.set(calls)
+        started_token = _started.set(started)
+        try:
+            await self.app(scope, traced_receive, traced_send)
+        finally:
+            _calls.reset(calls_token)
+            _started.reset(started_token)
+            route = scope.get("route")
+            path_params = scope.get("path_params") or {}
+            record.update(
+                route=getattr(route, "path", None),
+                game=fingerprint(path_params["game_id"], 12) if "game_id" in path_params else None,
+                status=status or 500,
+                dur_ms=round((time.perf_counter() - started) * 1000, 1),
+                ttfb_ms=round((first_byte - started) * 1000, 1) if first_byte else None,
+                fp=digest.hexdigest()[:16] if counts["req_bytes"] else None,
+                **{k: v for k, v in counts.items() if v},
+                calls=calls,
+            )
+            self.writer.write({k: v for k, v in record.items() if v is not None})
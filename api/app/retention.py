@@ -0,0 +1,228 @@
+"""終了・放置されたゲームのデータ削除 (保持期間の適用)。
+
+games を updated_at 順に走査し、保持期間を過ぎたゲームについて
+GCS の `games/{id}/` 以下のオブジェクト → photos ドキュメント → events / snapshots
+サブコレクション → games ドキュメントの順に削除する。games ドキュメントを最後に
+消すので、途中で止まっても次回の実行で同じゲームが再び見つかり、続きから削除される。
+チェックポイント (走査位置と集計) を保存すれば、中断した実行をそのまま再開できる。
+
+scripts/cleanup_games.py から実行する。
+"""
+
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app.config import (
+    RETENTION_ABANDONED_DAYS,
+    RETENTION_SOLVED_DAYS,
+    RETENTION_UPLOADS_DAYS,
+)
+from app.firebase import bucket, db
+
+logger = logging.getLogger(__name__)
+
+# Firestore のバッチ書き込みは 1 回 500 件まで
+FIRESTORE_BATCH_SIZE = 500
+# GCS のバッチリクエストにまとめる削除数
+GCS_BATCH_SIZE = 100
+# games を走査するページサイズ
+SCAN_PAGE_SIZE = 200
+
+
+@dataclass
+class RetentionPolicy:
+    solved_days: float = RETENTION_SOLVED_DAYS
+    abandoned_days: float = RETENTION_ABANDONED_DAYS
+    uploads_days: float = RETENTION_UPLOADS_DAYS
+
+    def cutoff(self, now: datetime, status: str | None) -> datetime:
+        days = self.solved_days if status == "solved" else self.abandoned_days
+        return now - timedelta(days=days)
+
+    def scan_cutoff(self, now: datetime) -> datetime:
+        """どのステータスでも、これより新しい updated_at のゲームは対象外。"""
+        return now - timedelta(days=min(self.solved_days, self.abandoned_days))
+
+
+@dataclass
+class RetentionReport:
+    started_at: str
+    dry_run: bool
+    cursor: dict | None = None  # 最後に処理したゲーム {"id", "updated_at"}
+    games_scanned: int = 0
+    games_deleted: int = 0
+    blobs_deleted: int = 0
+    bytes_deleted: int = 0
+    docs_deleted: int = 0
+    uploads_deleted: int = 0
+    elapsed_s: float = 0.0
+    finished: bool = False
+    errors: list[str] = field(default_factory=list)
+
+    def throughput(self) -> dict:
+        elapsed = self.elapsed_s or float("nan")
+        return {
+            "games_per_s": self.games_deleted / elapsed,
+            "blobs_per_s": (self.blobs_deleted + self.uploads_deleted) / elapsed,
+            "docs_per_s": self.docs_deleted / elapsed,
+            "mb_per_s": self.bytes_deleted / 1_000_000 / elapsed,
+        }
+
+    def save(self, path: Path) -> None:
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(asdict(self), ensure_ascii=False, indent=2))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "RetentionReport":
+        return cls(**json.loads(path.read_text()))
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def delete_blobs(blobs: list, dry_run: bool) -> tuple[int, int]:
+    """GCS オブジェクトをバッチリクエストで削除し、(件数, バイト数) を返す。"""
+    count = len(blobs)
+    size = sum(b.size or 0 for b in blobs)
+    if dry_run:
+        return count, size
+    for chunk in _chunks(blobs, GCS_BATCH_SIZE):
+        # 既に消えているオブジェクトがあっても止めない (再実行時など)
+        with bucket.client.batch(raise_exception=False):
+            for blob in chunk:
+                blob.delete()
+    return count, size
+
+
+def delete_documents(refs: list, dry_run: bool) -> int:
+    """ドキュメントをバッチ書き込みでまとめて削除し、件数を返す。"""
+    if dry_run:
+        return len(refs)
+    for chunk in _chunks(refs, FIRESTORE_BATCH_SIZE):
+        batch = db.batch()
+        for ref in chunk:
+            batch.delete(ref)
+        batch.commit()
+    return len(refs)
+
+
+def delete_game(game_id: str, dry_run: bool, report: RetentionReport) -> None:
+    """1 ゲーム分のデータを削除する。games ドキュメントは最後に消す。"""
+    blobs = list(bucket.list_blobs(prefix=f"games/{game_id}/"))
+    count, size = delete_blobs(blobs, dry_run)
+    report.blobs_deleted += count
+    report.bytes_deleted += size
+
+    game_ref = db.collection("games").document(game_id)
+    photo_refs = [
+        doc.reference
+        for doc in db.collection("photos").where("game_id", "==", game_id).stream()
+    ]
+    sub_refs = [
+        ref
+        for name in ("events", "snapshots")
+        for ref in game_ref.collection(name).list_documents()
+    ]
+    report.docs_deleted += delete_documents(photo_refs + sub_refs, dry_run)
+    report.docs_deleted += delete_documents([game_ref], dry_run)
+    report.games_deleted += 1
+
+
+def _expired_games(now: datetime, policy: RetentionPolicy, cursor: dict | None):
+    """保持期間を過ぎたゲームを updated_at の古い順に返す (走査位置も更新して返す)。"""
+    query = (
+        db.collection("games")
+        .where("updated_at", "<", policy.scan_cutoff(now))
+        .order_by("updated_at")
+        .order_by("__name__")
+    )
+    start = None
+    if cursor:
+        # 前回最後に見たゲームは削除済みのことが多いので、フィールド値で再開位置を指定する
+        start = {
+            "updated_at": datetime.fromisoformat(cursor["updated_at"]),
+            "__name__": db.collection("games").document(cursor["id"]),
+        }
+
+    while True:
+        page_query = query.start_after(start) if start is not None else query
+        page = list(page_query.limit(SCAN_PAGE_SIZE).stream())
+        for doc in page:
+            data = doc.to_dict()
+            expired = data["updated_at"] < policy.cutoff(now, data.get("status"))
+            yield doc, expired
+        if len(page) < SCAN_PAGE_SIZE:
+            return
+        start = page[-1]
+
+
+def cleanup_uploads(now: datetime, policy: RetentionPolicy, dry_run: bool) -> int:
+    cutoff = now - timedelta(days=policy.uploads_days)
+    expired = [
+        b for b in bucket.list_blobs(prefix="uploads/") if b.updated and b.updated < cutoff
+    ]
+    count, _ = delete_blobs(expired, dry_run)
+    return count
+
+
+def run(
+    policy: RetentionPolicy | None = None,
+    dry_run: bool = False,
+    checkpoint: Path | None = None,
+    max_games: int | None = None,
+) -> RetentionReport:
+    """保持期間を過ぎたゲームと uploads/ を削除する。
+
+    checkpoint に未完了の実行が保存されていれば、その基準時刻と走査位置から再開する。
+    max_games を指定すると、その件数を削除 (dry_run では対象数え上げ) した時点で止める
+    (checkpoint から続きを実行できる)。
+    """
+    policy = policy or RetentionPolicy()
+    report = None
+    if checkpoint and checkpoint.exists():
+        report = RetentionReport.load(checkpoint)
+        if report.finished or report.dry_run != dry_run:
+            report = None
+        else:
+            logger.info("Resuming retention run started at %s", report.started_at)
+    if report is None:
+        report = RetentionReport(
+            started_at=datetime.now(timezone.utc).isoformat(), dry_run=dry_run
+        )
+
+    now = datetime.fromisoformat(report.started_at)
+    started = time.perf_counter() - report.elapsed_s
+    processed = 0
+
+    for doc, expired in _expired_games(now, policy, report.cursor):
+        report.games_scanned += 1
+        if expired:
+            try:
+                delete_game(doc.id, dry_run, report)
+                processed += 1
+            except Exception as e:
+                logger.exception("Failed to delete game %s", doc.id)
+                report.errors.append(f"{doc.id}: {e}")
+        report.cursor = {
+            "id": doc.id,
+            "updated_at": doc.to_dict()["updated_at"].isoformat(),
+        }
+        report.elapsed_s = time.perf_counter() - started
+        if checkpoint:
+            report.save(checkpoint)
+        if max_games is not None and processed >= max_games:
+            return report
+
+    report.uploads_deleted += cleanup_uploads(now, policy, dry_run)
+    report.elapsed_s = time.perf_counter() - started
+    report.finished = True
+    if checkpoint:
+        report.save(checkpoint)
+    return report
@@ -1,12 +1,16 @@
 import json
 import logging
+import uuid
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from google.genai import types
 
-from app.firebase import bucket, db
+from app import export, http_cache, model_router, timeline
+from app.firebase import db
 from app.gemini import client
+from app.image_store import store_generated_image
 from app.scenario import get_game_items, load_solution
 from app.schemas import (
     AccusationJudgment,
@@ -36,16 +40,40 @@ async def create_game(req: GameCreateRequest):
         "created_at": now,
         "updated_at": now,
     }
-    doc_ref.set(data)
+    batch = db.batch()
+    batch.set(doc_ref, data)
+    timeline.append(
+        doc_ref,
+        [
+            timeline.new_event(
+                "game_created",
+                player_name=req.player_name,
+                status="waiting",
+                photo_count=0,
+                ghost_description=req.ghost_description,
+                cleared_items=[],
+            )
+        ],
+        batch=batch,
+        event_count=0,
+    )
     return GameResponse(id=doc_ref.id, **data)
 
 
 @router.get("/{game_id}", response_model=GameResponse)
-async def get_game(game_id: str):
+async def get_game(game_id: str, request: Request):
     doc = db.collection("games").document(game_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Game not found")
-    return GameResponse(id=doc.id, **doc.to_dict())
+    # 状態の変更は必ず updated_at を更新するので、それを版として使う
+    data = doc.to_dict()
+    etag = http_cache.etag_for(doc.id, data.get("updated_at"), data.get("event_count"))
+    return http_cache.respond(
+        request,
+        etag,
+        http_cache.REVALIDATE,
+        lambda: GameResponse(id=doc.id, **data),
+    )
 
 
 @router.patch("/{game_id}", response_model=GameResponse)
@@ -59,13 +87,40 @@ async def update_game(game_id: str, req: GameUpdateRequest):
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    updates["updated_at"] = datetime.now(timezone.utc)
-    doc_ref.update(updates)
+    timeline.append(
+        doc_ref,
+        [timeline.new_event("status_changed", status=updates["status"])],
+        event_count=doc.to_dict().get("event_count", 0),
+    )
 
     updated_doc = doc_ref.get()
     return GameResponse(id=updated_doc.id, **updated_doc.to_dict())
 
 
+@router.get(
+    "/{game_id}/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/zip": {}}}},
+)
+async def export_game(game_id: str):
+    """ゲームの写真・幽霊画像と写真レコードの manifest.json を ZIP でストリーム配信する。"""
+    if not db.collection("games").document(game_id).get().exists:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    docs = (
+        db.collection("photos")
+        .where("game_id", "==", game_id)
+        .order_by("created_at")
+        .stream()
+    )
+    photos = [{"id": doc.id, **doc.to_dict()} for doc in docs]
+    return StreamingResponse(
+        export.stream_zip(game_id, photos),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{game_id}.zip"'},
+    )
+
+
 @router.post("/{game_id}/avatar", response_model=AvatarResponse)
 async def generate_avatar(game_id: str):
     """ghost_description からアバター画像を生成し GCS に保存する。"""
@@ -86,18 +141,21 @@ async def generate_avatar(game_id: str):
 スタイル: リアルな日本人で、上半身のポートレート、シンプルな背景。
 注意: 幽霊や怖い要素は一切入れないでください。普通の生きている人物として描いてください。"""
 
-    response = await client.aio.models.generate_content(
-        model="nano-banana-pro-preview",
-        contents=avatar_prompt,
-        config=types.GenerateContentConfig(
-            response_modalities=["IMAGE", "TEXT"],
-        ),
-    )
+    try:
+        routed = await model_router.generate_image(
+            "avatar",
+            avatar_prompt,
+            types.GenerateContentConfig(
+                response_modalities=["IMAGE", "TEXT"],
+            ),
+        )
+    except model_router.ModelRoutingError:
+        raise HTTPException(status_code=500, detail="Avatar image generation failed")
 
     avatar_image_data = None
     avatar_mime_type = "image/png"
 
-    for part in response.candidates[0].content.parts:
+    for part in routed.response.candidates[0].content.parts:
         if part.inline_data:
             avatar_image_data = part.inline_data.data
             avatar_mime_type = part.inline_data.mime_type or "image/png"
@@ -105,19 +163,27 @@ async def generate_avatar(game_id: str):
     if not avatar_image_data:
         raise HTTPException(status_code=500, detail="Avatar image generation failed")
 
-    # GCS にアップロード
-    ext = "png" if "png" in avatar_mime_type else "jpg"
-    gcs_path = f"games/{game_id}/avatar.{ext}"
-    blob = bucket.blob(gcs_path)
-    blob.upload_from_string(avatar_image_data, content_type=avatar_mime_type)
-    blob.make_public()
-    avatar_url = blob.public_url
+    # 再エンコードして GCS にアップロード。再生成のたびに別のパスにするので、
+    # URL をキーにしたキャッシュ (ブラウザ・Files API のハンドル) が古い画像を返さない。
+    # 以前のアバターはタイムラインの過去の状態から参照されるので残す
+    avatar = await store_generated_image(
+        f"games/{game_id}/avatar-{uuid.uuid4().hex[:8]}",
+        avatar_image_data,
+        avatar_mime_type,
+    )
+    avatar_url = avatar.url
 
     # Firestore に保存
-    game_ref.update({
-        "avatar_url": avatar_url,
-        "updated_at": datetime.now(timezone.utc),
-    })
+    timeline.append(
+        game_ref,
+        [timeline.new_event("avatar_ready", avatar_url=avatar_url)],
+        updates={
+            "avatar_bytes_original": avatar.original_bytes,
+            "avatar_bytes_stored": avatar.stored_bytes,
+            "avatar_model": routed.model,
+        },
+        event_count=game_data.get("event_count", 0),
+    )
 
     return AvatarResponse(game_id=game_id, avatar_url=avatar_url)
 
@@ -145,11 +211,18 @@ async def accuse(game_id: str, req: AccusationRequest):
     solution_text = load_solution()
     judgment = await _judge_accusation(req.suspect_name, req.reason, solution_text)
 
-    if judgment.correct:
-        game_ref.update({
-            "status": "solved",
-            "updated_at": datetime.now(timezone.utc),
-        })
+    # 正解ならプロジェクション側で status が solved になる
+    timeline.append(
+        game_ref,
+        [
+            timeline.new_event(
+                "accusation_made",
+                suspect_name=req.suspect_name,
+                correct=judgment.correct,
+            )
+        ],
+        event_count=game_data.get("event_count", 0),
+    )
 
     return AccusationResponse(correct=judgment.correct, message=judgment.explanation)
 
@@ -1,8 +1,13 @@
 import base64
+import logging
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from google.genai import types
 
+from app import model_router, sse
+from app.cache import make_cache, make_key
+from app.config import GENERATE_CACHE_SIZE, GENERATE_CACHE_TTL_S
 from app.gemini import client
 from app.schemas import (
     GenerateImageRequest,
@@ -11,28 +16,112 @@ from app.schemas import (
     GenerateResponse,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/gemini", tags=["gemini"])
 
+# temperature=0 のときだけ prompt + model + temperature をキーに応答を再利用する
+generate_cache = make_cache("generate", GENERATE_CACHE_SIZE, GENERATE_CACHE_TTL_S)
+
+
+def _cache_key(req: GenerateRequest) -> str | None:
+    if req.temperature != 0:
+        return None
+    return make_key(req.model, req.temperature, req.prompt)
+
+
+def _generate_config(req: GenerateRequest) -> types.GenerateContentConfig | None:
+    if req.temperature is None:
+        return None
+    return types.GenerateContentConfig(temperature=req.temperature)
+
 
 @router.post("/generate", response_model=GenerateResponse)
 async def generate(req: GenerateRequest):
+    key = _cache_key(req)
+    if key and (text := generate_cache.get(key)) is not None:
+        return GenerateResponse(text=text)
+
     response = await client.aio.models.generate_content(
         model=req.model,
         contents=req.prompt,
+        config=_generate_config(req),
     )
+    if key and response.text is not None:
+        generate_cache.set(key, response.text)
     return GenerateResponse(text=response.text)
 
 
+@router.post(
+    "/generate/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def generate_stream(req: GenerateRequest, request: Request):
+    """生成中のテキストを Server-Sent Events で逐次返す。
+
+    チャンクごとに `data: {"text": ...}`、完了時に `event: done` (全文) を送る。
+    クライアントが切断したら Gemini へのストリームを閉じて生成を打ち切る。
+    """
+    key = _cache_key(req)
+    cached = generate_cache.get(key) if key else None
+
+    async def events():
+        if cached is not None:
+            yield sse.format_event({"text": cached})
+            yield sse.format_event({"text": cached, "cached": True}, event="done")
+            return
+
+        chunks: list[str] = []
+        stream = None
+        try:
+            # 接続時の失敗 (429 / 500 / 不明なモデル) も途中の失敗と同じく error イベントで返す
+            stream = await client.aio.models.generate_content_stream(
+                model=req.model,
+                contents=req.prompt,
+                config=_generate_config(req),
+            )
+            async for chunk in stream:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected; cancelling generation")
+                    return
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield sse.format_event({"text": chunk.text})
+        except Exception as e:
+            logger.exception("Streaming generation failed")
+            yield sse.format_event({"detail": str(e)}, event="error")
+            return
+        finally:
+            if stream is not None:
+                await stream.aclose()
+
+        text = "".join(chunks)
+        if key:
+            generate_cache.set(key, text)
+        yield sse.format_event({"text": text, "cached": False}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/generate-image", response_model=GenerateImageResponse)
 async def generate_image(req: GenerateImageRequest):
-    response = await client.aio.models.generate_content(
-        model="nano-banana-pro-preview",
-        contents=req.prompt,
-        config=types.GenerateContentConfig(
-            response_modalities=["IMAGE", "TEXT"],
-        ),
-    )
-    for part in response.candidates[0].content.parts:
+    try:
+        routed = await model_router.generate_image(
+            "generate_image",
+            req.prompt,
+            types.GenerateContentConfig(
+                response_modalities=["IMAGE", "TEXT"],
+            ),
+        )
+    except model_router.ModelRoutingError:
+        # どの段も画像を返さなかった (上流の失敗) ので空の画像ではなくエラーにする
+        raise HTTPException(status_code=502, detail="Image generation failed")
+    for part in routed.response.candidates[0].content.parts:
         if part.inline_data:
             return GenerateImageResponse(
                 image=base64.b64encode(part.inline_data.data).decode(),
@@ -1,14 +1,52 @@
 import asyncio
 import base64
 import json
+import logging
+import time
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 from google.genai import types
 
+from app import metrics
+from app.admission import AdmissionRejected, controller
+from app.config import LIVE_DETECT_INTERVAL_S
 from app.gemini import client
+from app.routers.turn import (
+    ITEM_LABELS,
+    accepted_item,
+    complete_turn,
+    load_turn_state,
+    parse_detection_text,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["live"])
 
+LIVE_MODEL = "gemini-2.0-flash-live-001"
+
+# 判定の応答がこの時間返らなければ次の判定を送る
+_PROBE_TIMEOUT_S = 10.0
+
+
+def _items_line(remaining_items: list[str]) -> str:
+    items_str = ", ".join(
+        f"{item}({ITEM_LABELS.get(item, item)})" for item in remaining_items
+    )
+    return f"残りアイテム: {items_str}"
+
+
+def _viewfinder_instruction(remaining_items: list[str]) -> str:
+    return f"""あなたはミステリーゲームのカメラのファインダーです。プレイヤーはカメラを動かしながら部屋を映しています。
+{_items_line(remaining_items)}
+「判定」と送られたら、直近の映像に上記アイテムのどれかが写っているかを判定し、最も確信度の高いもの1つだけを JSON だけで回答してください。
+どれも写っていない場合は detected_item を null にしてください。
+{{"detected_item": "アイテム名 or null", "confidence": "high/medium/low/none", "explanation": "判定理由"}}"""
+
+
+def _user_text(text: str) -> types.Content:
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
 
 @router.websocket("/ws/live")
 async def live_session(ws: WebSocket):
@@ -59,3 +97,160 @@ async def live_session(ws: WebSocket):
         except WebSocketDisconnect:
             recv_task.cancel()
             await recv_task
+
+
+@router.websocket("/ws/live/{game_id}")
+async def live_viewfinder(ws: WebSocket, game_id: str):
+    """ゲームの残りアイテムを探すライブビューファインダー。
+
+    クライアントはカメラのフレームを {"type": "image"} で送り続ける。サーバは一定間隔で
+    直近の映像を判定させて {"type": "detection"} を返し、残りアイテムが写ったときだけ
+    そのフレームでターン (幽霊合成) を実行して {"type": "turn"} を返す。
+    """
+    await ws.accept()
+    try:
+        game_ref, game_data, all_items, remaining_items = load_turn_state(game_id)
+    except HTTPException as e:
+        await ws.send_json({"type": "error", "detail": e.detail})
+        await ws.close(code=1008)
+        return
+
+    stats = metrics.turn_engines["live"]
+    latest_frame: tuple[bytes, str] | None = None
+    # 判定中のフレーム (応答待ちでなければ None)
+    probe_frame: tuple[bytes, str] | None = None
+    probe_sent_at = 0.0
+    turn_task: asyncio.Task | None = None
+
+    config = types.LiveConnectConfig(
+        response_modalities=["TEXT"],
+        system_instruction=_viewfinder_instruction(remaining_items),
+    )
+
+    async with client.aio.live.connect(model=LIVE_MODEL, config=config) as session:
+        await ws.send_json({"type": "ready", "remaining_items": remaining_items})
+
+        async def run_turn(frame: tuple[bytes, str], detected_item: str) -> None:
+            nonlocal game_ref, game_data, all_items, remaining_items
+            await ws.send_json({"type": "turn_started", "detected_item": detected_item})
+            # WebSocket はミドルウェアを通らないので、ここで同じ制御を掛ける
+            try:
+                await controller.acquire()
+            except AdmissionRejected as e:
+                await ws.send_json({"type": "busy", "retry_after": e.retry_after})
+                return
+            started = time.perf_counter()
+            photo_bytes, mime_type = frame
+            try:
+                result = await complete_turn(
+                    game_id,
+                    game_ref,
+                    game_data,
+                    all_items,
+                    photo_bytes,
+                    mime_type,
+                    None,  # 合成用に Files API にアップロードする
+                    detected_item,
+                    stats,
+                    started,
+                )
+            finally:
+                controller.release(time.perf_counter() - started)
+            await ws.send_json({"type": "turn", "data": result.model_dump(mode="json")})
+
+            try:
+                game_ref, game_data, all_items, remaining_items = load_turn_state(
+                    game_id
+                )
+            except HTTPException:
+                remaining_items = []
+                await ws.send_json({"type": "all_cleared"})
+                return
+            await session.send_client_content(
+                turns=_user_text(
+                    f"残りアイテムが変わりました。\n{_items_line(remaining_items)}"
+                ),
+                turn_complete=False,
+            )
+            await ws.send_json({"type": "ready", "remaining_items": remaining_items})
+
+        def turn_done(task: asyncio.Task) -> None:
+            nonlocal turn_task
+            turn_task = None
+            if not task.cancelled() and task.exception():
+                logger.error("Live turn failed", exc_info=task.exception())
+
+        async def recv_from_gemini():
+            nonlocal probe_frame, turn_task
+            text = ""
+            try:
+                while True:
+                    async for response in session.receive():
+                        if response.text:
+                            text += response.text
+                        if not (
+                            response.server_content
+                            and response.server_content.turn_complete
+                        ):
+                            continue
+                        frame, probe_frame = probe_frame, None
+                        detection, _ = parse_detection_text([text], remaining_items)
+                        text = ""
+                        if detection is None:
+                            continue
+                        await ws.send_json(
+                            {"type": "detection", **detection.model_dump()}
+                        )
+                        item = accepted_item(detection)
+                        if item and frame and turn_task is None:
+                            turn_task = asyncio.create_task(run_turn(frame, item))
+                            turn_task.add_done_callback(turn_done)
+            except asyncio.CancelledError:
+                pass
+
+        recv_task = asyncio.create_task(recv_from_gemini())
+
+        try:
+            while True:
+                text = await ws.receive_text()
+                try:
+                    msg = json.loads(text)
+                    if msg.get("type") != "image":
+                        continue
+                    latest_frame = (
+                        base64.b64decode(msg["data"]),
+                        msg.get("mime_type", "image/jpeg"),
+                    )
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # 壊れたメッセージは読み飛ばし、セッションは続ける
+                    logger.warning("Ignoring malformed live message for %s", game_id)
+                    continue
+                await session.send_realtime_input(
+                    video=types.Blob(data=latest_frame[0], mime_type=latest_frame[1]),
+                )
+
+                # ターン実行中・判定待ち・全アイテム発見済みなら判定は送らない
+                now = time.monotonic()
+                waiting = (
+                    probe_frame is not None and now - probe_sent_at < _PROBE_TIMEOUT_S
+                )
+                if (
+                    turn_task is None
+                    and not waiting
+                    and remaining_items
+                    and now - probe_sent_at >= LIVE_DETECT_INTERVAL_S
+                ):
+                    probe_frame, probe_sent_at = latest_frame, now
+                    await session.send_client_content(
+                        turns=_user_text("判定"), turn_complete=True
+                    )
+
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # 切断以外の理由 (Live API のエラーなど) で抜けても受信タスクを残さない
+            recv_task.cancel()
+            await asyncio.gather(recv_task, return_exceptions=True)
+            # 実行中のターンは記録まで終わらせる
+            if turn_task:
+                await asyncio.gather(turn_task, return_exceptions=True)
@@ -1,20 +1,44 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, HTTPException, UploadFile
+from fastapi import APIRouter, HTTPException, Request, UploadFile
 from google.genai import types
 
+from app import http_cache, media, model_router, timeline
 from app.firebase import bucket, db
-from app.gemini import client
+from app.image_store import store_derivatives, store_generated_image
 from app.scenario import load_hint_messages
 from app.schemas import PhotoListResponse, PhotoResponse
 
 router = APIRouter(prefix="/game/{game_id}/photos", tags=["photo"])
 
+DERIVATIVE_FIELDS = (
+    "thumbnail_url",
+    "preview_url",
+    "ghost_thumbnail_url",
+    "ghost_preview_url",
+)
+
+
+def _photo_response(photo_id: str, d: dict) -> PhotoResponse:
+    return PhotoResponse(
+        id=photo_id,
+        game_id=d["game_id"],
+        original_url=d["original_url"],
+        ghost_url=d.get("ghost_url"),
+        ghost_gesture=d.get("ghost_gesture"),
+        ghost_message=d.get("ghost_message"),
+        ghost_model=d.get("ghost_model"),
+        detected_item=d.get("detected_item"),
+        **{f: d.get(f) for f in DERIVATIVE_FIELDS},
+        created_at=d["created_at"],
+    )
+
 
 @router.post("/", response_model=PhotoResponse)
 async def upload_photo(game_id: str, file: UploadFile):
     # Verify game exists
-    game_doc = db.collection("games").document(game_id).get()
+    game_ref = db.collection("games").document(game_id)
+    game_doc = game_ref.get()
     if not game_doc.exists:
         raise HTTPException(status_code=404, detail="Game not found")
 
@@ -24,9 +48,11 @@ async def upload_photo(game_id: str, file: UploadFile):
     # Upload to GCS
     seq = f"{photo_count:03d}"
     gcs_path = f"games/{game_id}/photos/{seq}_original.jpg"
+    photo_bytes = await file.read()
     blob = bucket.blob(gcs_path)
-    blob.upload_from_file(file.file, content_type=file.content_type or "image/jpeg")
+    blob.upload_from_string(photo_bytes, content_type=file.content_type or "image/jpeg")
     blob.make_public()
+    derivative_urls = await store_derivatives(gcs_path, photo_bytes)
 
     now = datetime.now(timezone.utc)
 
@@ -40,21 +66,26 @@ async def upload_photo(game_id: str, file: UploadFile):
         "ghost_url": None,
         "ghost_gesture": None,
         "ghost_message": None,
+        **derivative_urls,
         "created_at": now,
     }
-    photo_ref.set(photo_data)
-
-    # Update game photo count
-    db.collection("games").document(game_id).update(
-        {"photo_count": photo_count, "updated_at": now}
+    batch = db.batch()
+    batch.set(photo_ref, photo_data)
+    timeline.append(
+        game_ref,
+        [
+            timeline.new_event(
+                "photo_uploaded",
+                photo_id=photo_ref.id,
+                original_url=photo_data["original_url"],
+                thumbnail_url=photo_data.get("thumbnail_url"),
+            )
+        ],
+        batch=batch,
+        event_count=game_data.get("event_count", 0),
     )
 
-    return PhotoResponse(
-        id=photo_ref.id,
-        game_id=game_id,
-        original_url=blob.public_url,
-        created_at=now,
-    )
+    return _photo_response(photo_ref.id, photo_data)
 
 
 @router.get("/", response_model=PhotoListResponse)
@@ -65,41 +96,29 @@ async def list_photos(game_id: str):
         .order_by("created_at")
         .stream()
     )
-    photos = []
-    for doc in docs:
-        d = doc.to_dict()
-        photos.append(
-            PhotoResponse(
-                id=doc.id,
-                game_id=d["game_id"],
-                original_url=d["original_url"],
-                ghost_url=d.get("ghost_url"),
-                ghost_gesture=d.get("ghost_gesture"),
-                ghost_message=d.get("ghost_message"),
-                detected_item=d.get("detected_item"),
-                created_at=d["created_at"],
-            )
-        )
+    photos = [_photo_response(doc.id, doc.to_dict()) for doc in docs]
     return PhotoListResponse(photos=photos)
 
 
 @router.get("/{photo_id}", response_model=PhotoResponse)
-async def get_photo(game_id: str, photo_id: str):
+async def get_photo(game_id: str, photo_id: str, request: Request):
     doc = db.collection("photos").document(photo_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Photo not found")
     d = doc.to_dict()
     if d["game_id"] != game_id:
         raise HTTPException(status_code=404, detail="Photo not found")
-    return PhotoResponse(
-        id=doc.id,
-        game_id=d["game_id"],
-        original_url=d["original_url"],
-        ghost_url=d.get("ghost_url"),
-        ghost_gesture=d.get("ghost_gesture"),
-        ghost_message=d.get("ghost_message"),
-        detected_item=d.get("detected_item"),
-        created_at=d["created_at"],
+    # 幽霊画像は POST /{photo_id}/ghost で同じパスに作り直されることがあるので、毎回再検証させる
+    etag = http_cache.etag_for(
+        doc.id,
+        d["created_at"],
+        d.get("ghost_path"),
+        d.get("ghost_message"),
+        d.get("ghost_model"),
+        d.get("ghost_bytes_stored"),
+    )
+    return http_cache.respond(
+        request, etag, http_cache.REVALIDATE, lambda: _photo_response(doc.id, d)
     )
 
 
@@ -142,10 +161,7 @@ async def generate_ghost(game_id: str, photo_id: str):
     # Generate ghost image via Gemini
     contents: list[types.Part] = []
     if avatar_url:
-        avatar_blob_name = avatar_url.split(f"/{bucket.name}/")[-1]
-        avatar_blob = bucket.blob(avatar_blob_name)
-        avatar_bytes = avatar_blob.download_as_bytes()
-        contents.append(types.Part.from_bytes(data=avatar_bytes, mime_type="image/png"))
+        contents.append(await media.avatar_part(avatar_url))
 
     # 元の写真を取得して添付
     original_blob = bucket.blob(photo_data["original_path"])
@@ -153,19 +169,22 @@ async def generate_ghost(game_id: str, photo_id: str):
     contents.append(types.Part.from_bytes(data=original_bytes, mime_type="image/jpeg"))
     contents.append(types.Part.from_text(text=ghost_prompt))
 
-    response = await client.aio.models.generate_content(
-        model="gemini-2.0-flash-exp-image-generation",
-        contents=contents,
-        config=types.GenerateContentConfig(
-            response_modalities=["IMAGE", "TEXT"],
-        ),
-    )
+    try:
+        routed = await model_router.generate_image(
+            "photo_ghost",
+            contents,
+            types.GenerateContentConfig(
+                response_modalities=["IMAGE", "TEXT"],
+            ),
+        )
+    except model_router.ModelRoutingError:
+        raise HTTPException(status_code=500, detail="Failed to generate ghost image")
 
     ghost_image_data = None
     ghost_mime_type = "image/jpeg"
     ghost_message = None
 
-    for part in response.candidates[0].content.parts:
+    for part in routed.response.candidates[0].content.parts:
         if part.inline_data:
             ghost_image_data = part.inline_data.data
             ghost_mime_type = part.inline_data.mime_type
@@ -175,31 +194,42 @@ async def generate_ghost(game_id: str, photo_id: str):
     if not ghost_image_data:
         raise HTTPException(status_code=500, detail="Failed to generate ghost image")
 
-    # Upload ghost image to GCS
-    original_path = photo_data["original_path"]
-    ghost_path = original_path.replace("_original.", "_ghost.")
-    blob = bucket.blob(ghost_path)
-    blob.upload_from_string(ghost_image_data, content_type=ghost_mime_type)
-    blob.make_public()
-
-    now = datetime.now(timezone.utc)
+    # Transcode and upload ghost image to GCS
+    original_base = photo_data["original_path"].rsplit(".", 1)[0]
+    ghost = await store_generated_image(
+        original_base.replace("_original", "_ghost"),
+        ghost_image_data,
+        ghost_mime_type,
+        derivative_prefix="ghost_",
+    )
 
     # Update Firestore
     update_data = {
-        "ghost_path": ghost_path,
-        "ghost_url": blob.public_url,
+        "ghost_path": ghost.path,
+        "ghost_url": ghost.url,
         "ghost_gesture": hint_messages.get("none", ""),
         "ghost_message": ghost_message,
+        "ghost_model": routed.model,
+        "ghost_bytes_original": ghost.original_bytes,
+        "ghost_bytes_stored": ghost.stored_bytes,
+        **ghost.derivative_urls,
     }
-    db.collection("photos").document(photo_id).update(update_data)
-    db.collection("games").document(game_id).update({"updated_at": now})
-
-    return PhotoResponse(
-        id=photo_id,
-        game_id=game_id,
-        original_url=photo_data["original_url"],
-        ghost_url=blob.public_url,
-        ghost_gesture=hint_messages.get("none", ""),
-        ghost_message=ghost_message,
-        created_at=photo_data["created_at"],
+    batch = db.batch()
+    batch.update(db.collection("photos").document(photo_id), update_data)
+    timeline.append(
+        db.collection("games").document(game_id),
+        [
+            timeline.new_event(
+                "ghost_ready",
+                photo_id=photo_id,
+                ghost_url=ghost.url,
+                ghost_thumbnail_url=update_data.get("ghost_thumbnail_url"),
+                ghost_message=ghost_message,
+                detected_item=photo_data.get("detected_item"),
+            )
+        ],
+        batch=batch,
+        event_count=game_data.get("event_count", 0),
     )
+
+    return _photo_response(photo_id, {**photo_data, **update_data})
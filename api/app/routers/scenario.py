@@ -1,21 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from functools import lru_cache
 
+from fastapi import APIRouter, HTTPException, Request
+
+from app import http_cache
 from app.scenario import load_hint_messages
 from app.schemas import HintMessage
 
 router = APIRouter(prefix="/scenario", tags=["scenario"])
 
 
-@router.get("/hints", response_model=list[HintMessage])
-async def list_hint_messages_endpoint():
+@lru_cache(maxsize=1)
+def _hint_payloads() -> tuple[tuple[bytes, str], dict[str, tuple[bytes, str]]]:
+    """シナリオデータは実行中に変わらないので、シリアライズ済みのバイト列と ETag を保持する。"""
     messages = load_hint_messages()
-    return [HintMessage(item=k, message=v) for k, v in messages.items()]
+    all_body = http_cache.dumps(
+        [HintMessage(item=k, message=v).model_dump() for k, v in messages.items()]
+    )
+    items = {}
+    for k, v in messages.items():
+        body = HintMessage(item=k, message=v).model_dump_json().encode()
+        items[k] = (body, http_cache.etag_for(body))
+    return (all_body, http_cache.etag_for(all_body)), items
+
+
+@router.get("/hints", response_model=list[HintMessage])
+async def list_hint_messages_endpoint(request: Request):
+    body, etag = _hint_payloads()[0]
+    return http_cache.respond(request, etag, http_cache.STATIC, body)
 
 
 @router.get("/hints/{item}", response_model=HintMessage)
-async def get_hint_message(item: str):
-    messages = load_hint_messages()
-    msg = messages.get(item)
-    if msg is None:
+async def get_hint_message(item: str, request: Request):
+    payload = _hint_payloads()[1].get(item)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Hint message not found")
-    return HintMessage(item=item, message=msg)
+    body, etag = payload
+    return http_cache.respond(request, etag, http_cache.STATIC, body)
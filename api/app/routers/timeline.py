@@ -0,0 +1,108 @@
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app import game_feed, sse, timeline
+from app.firebase import db
+from app.schemas import (
+    GameResponse,
+    TimelineEvent,
+    TimelineResponse,
+    TimelineStateResponse,
+)
+
+router = APIRouter(prefix="/game/{game_id}/timeline", tags=["timeline"])
+
+# この間隔でイベントがなければ ping を送り、切断も確認する
+_HEARTBEAT_S = 15.0
+
+
+@router.get("/", response_model=TimelineResponse)
+async def list_timeline(
+    game_id: str,
+    after: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
+):
+    """イベントログを時系列順に返す。next_cursor を after に渡すと続きを取得できる。"""
+    docs = timeline.list_events(game_id, after=after, limit=limit)
+    if not docs and after is None:
+        if not db.collection("games").document(game_id).get().exists:
+            raise HTTPException(status_code=404, detail="Game not found")
+    events = [TimelineEvent(id=doc.id, **doc.to_dict()) for doc in docs]
+    next_cursor = events[-1].id if len(events) == limit else None
+    return TimelineResponse(events=events, next_cursor=next_cursor)
+
+
+@router.get("/state", response_model=TimelineStateResponse)
+async def get_timeline_state(game_id: str, at: str):
+    """イベント at 時点のゲーム状態をスナップショットとイベントログから復元する。
+
+    at が最初のイベントより前なら、ゲーム作成前の空の状態を返す。
+    イベントログ導入前に作られたゲームは過去の状態を復元できないので 409 を返す。
+    """
+    if not db.collection("games").document(game_id).get().exists:
+        raise HTTPException(status_code=404, detail="Game not found")
+    try:
+        state = timeline.state_at(game_id, at)
+    except timeline.IncompleteHistory:
+        raise HTTPException(
+            status_code=409, detail="Game history predates the event log"
+        )
+    return TimelineStateResponse(
+        event_id=at,
+        status=state.get("status"),
+        photo_count=state.get("photo_count") or 0,
+        avatar_url=state.get("avatar_url"),
+        cleared_items=state.get("cleared_items") or [],
+    )
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_timeline(game_id: str, request: Request):
+    """ゲームの変更を Server-Sent Events で配信する。
+
+    接続直後に現在の状態を `event: state` で送り、以降はイベントログに追記された
+    イベントを `event: <type>` (id はイベント ID) で送る。ポーリングの代わりに使う。
+    """
+    doc = db.collection("games").document(game_id).get()
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Game not found")
+    data = doc.to_dict()
+    # last_event_id のない古いゲームは、ログの先頭から流すとキューが溢れるので末尾から購読する
+    last_id = data.get("last_event_id") or timeline.latest_event_id(game_id)
+
+    async def events():
+        nonlocal last_id
+        yield sse.format_event(
+            GameResponse(id=game_id, **data).model_dump(mode="json"),
+            event="state",
+            event_id=last_id,
+        )
+        async with game_feed.subscribe(game_id, last_id) as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), _HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield sse.PING
+                    continue
+                if event is game_feed.OVERFLOW:
+                    return
+                if last_id and event["id"] <= last_id:
+                    continue
+                last_id = event["id"]
+                yield sse.format_event(
+                    {**event["data"], "created_at": event.get("created_at")},
+                    event=event["type"],
+                    event_id=event["id"],
+                )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
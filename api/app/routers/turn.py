@@ -1,15 +1,30 @@
+import asyncio
 import json
 import logging
+import re
+import time
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, HTTPException, UploadFile
-from google.cloud.firestore_v1 import ArrayUnion
+from google.genai import errors as genai_errors
 from google.genai import types
 
+from app import media, metrics, model_router, timeline
+from app.config import TURN_ENGINE, TURN_ENGINE_SHADOW_RATE
 from app.firebase import bucket, db
 from app.gemini import client
+from app.image_store import (
+    StoredImage,
+    store_derivatives,
+    store_generated_image,
+)
 from app.scenario import get_game_items, load_hint_messages
-from app.schemas import TurnResponse, VisionDetectionResult
+from app.schemas import (
+    BurstDetectionResult,
+    BurstTurnResponse,
+    TurnResponse,
+    VisionDetectionResult,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +40,13 @@ ITEM_LABELS = {
 # earring は phase1 アイテム完了後にのみ検出対象になる
 FINAL_ITEMS = {"earring"}
 
+# 連写ターンで一度に送れる写真の枚数
+MAX_BURST_FRAMES = 4
+
+CONFIDENCE_RANK = {"none": 0, "low": 1, "medium": 2, "high": 3}
+
+_JSON_OBJECT_RE = re.compile(r"\{.*?\}", re.DOTALL)
+
 
 def _build_vision_prompt(remaining_items: list[str]) -> str:
     items_str = ", ".join(
@@ -39,30 +61,73 @@ JSON形式で回答:
 {{"detected_item": "アイテム名 or null", "confidence": "high/medium/low/none", "explanation": "判定理由"}}"""
 
 
+def _build_burst_vision_prompt(remaining_items: list[str], frame_count: int) -> str:
+    items_str = ", ".join(
+        f"{item}({ITEM_LABELS.get(item, item)})" for item in remaining_items
+    )
+    return f"""あなたは写真に写っているものを判定するAIです。
+同じ場所を連写した写真が {frame_count} 枚、フレーム 0 から順に添付されています。
+フレーム数: {frame_count}
+残りアイテム: {items_str}
+各フレームについて、上記アイテムのどれかが写っているかを判定し、最も確信度の高いもの1つだけ回答してください。
+どれも写っていない場合は detected_item を null にしてください。
+
+JSON形式で、全フレーム分をフレーム番号順に回答:
+{{"frames": [{{"frame_index": 0, "detected_item": "アイテム名 or null", "confidence": "high/medium/low/none", "explanation": "判定理由"}}]}}"""
+
+
+def _ghost_action(detected_item: str | None) -> str:
+    if detected_item == "earring":
+        return "幽霊は隙間（または角）を指さしている。その場所に小さなイアリング（ピアス）が落ちているのが見える。イアリングを画像の中に小さく自然に描いてください"
+    if detected_item:
+        return f"幽霊は{ITEM_LABELS.get(detected_item, detected_item)}を指さしている"
+    return "幽霊はただ泣いている。悲しげに佇んでいる"
+
+
+def _ghost_appearance(has_avatar: bool) -> str:
+    if has_avatar:
+        return "添付のアバター画像の人物を幽霊として合成してください。"
+    return "幽霊の外見: 長い黒髪の少女の幽霊。白いワンピースを着て、悲しげな表情をしている。"
+
+
 def _build_ghost_prompt(
     hint_message: str, detected_item: str | None, has_avatar: bool
 ) -> str:
-    if detected_item == "earring":
-        action = "幽霊は隙間（または角）を指さしている。その場所に小さなイアリング（ピアス）が落ちているのが見える。イアリングを画像の中に小さく自然に描いてください"
-    elif detected_item:
-        action = f"幽霊は{ITEM_LABELS.get(detected_item, detected_item)}を指さしている"
-    else:
-        action = "幽霊はただ泣いている。悲しげに佇んでいる"
-    if has_avatar:
-        appearance = "添付のアバター画像の人物を幽霊として合成してください。"
-    else:
-        appearance = "幽霊の外見: 長い黒髪の少女の幽霊。白いワンピースを着て、悲しげな表情をしている。"
     return f"""この写真に幽霊を合成してください。
-{appearance}
-幽霊の行動: {action}
+{_ghost_appearance(has_avatar)}
+幽霊の行動: {_ghost_action(detected_item)}
 元の写真の構図や雰囲気を保持したまま、幽霊を自然に重ねてください。
 ただし、幽霊は自然に人が写り込んでいるように、違和感がないようにしてください。
 半透明にはしないでください。"""
 
 
-@router.post("/turn", response_model=TurnResponse)
-async def play_turn(game_id: str, file: UploadFile):
-    # 1. ゲーム検証
+def _build_fused_prompt(remaining_items: list[str], has_avatar: bool) -> str:
+    """検出と幽霊合成を 1 回のリクエストで行うためのプロンプト。"""
+    items_str = ", ".join(
+        f"{item}({ITEM_LABELS.get(item, item)})" for item in remaining_items
+    )
+    actions = "\n".join(f"- {item}: {_ghost_action(item)}" for item in remaining_items)
+    return f"""あなたは写真に写っているものを判定し、その写真に幽霊を合成するAIです。次の2つを行ってください。
+
+1. 判定
+残りアイテム: {items_str}
+この写真に上記アイテムのどれかが写っていますか？最も確信度の高いもの1つだけ、最初のテキストとして JSON 形式で回答してください。
+どれも写っていない場合は detected_item を null にしてください。
+{{"detected_item": "アイテム名 or null", "confidence": "high/medium/low/none", "explanation": "判定理由"}}
+
+2. 合成
+この写真に幽霊を合成した画像を出力してください。
+{_ghost_appearance(has_avatar)}
+幽霊の行動は判定結果に応じて次のようにしてください（confidence が high または medium のときのみアイテムを指さす）。
+{actions}
+- 該当なし: {_ghost_action(None)}
+元の写真の構図や雰囲気を保持したまま、幽霊を自然に重ねてください。
+ただし、幽霊は自然に人が写り込んでいるように、違和感がないようにしてください。
+半透明にはしないでください。"""
+
+
+def load_turn_state(game_id: str) -> tuple:
+    """ゲームを読み、(game_ref, game_data, 全アイテム, 残りアイテム) を返す。"""
     game_ref = db.collection("games").document(game_id)
     game_doc = game_ref.get()
     if not game_doc.exists:
@@ -72,12 +137,9 @@ async def play_turn(game_id: str, file: UploadFile):
     if game_data.get("status") == "solved":
         raise HTTPException(status_code=400, detail="Game already solved")
 
-    avatar_url: str | None = game_data.get("avatar_url")
-    cleared_items: list[str] = game_data.get("cleared_items", [])
-
-    # 2. 残りアイテム計算（earring は phase1 完了後にのみ出現）
+    # 残りアイテム計算（earring は phase1 完了後にのみ出現）
     all_items = get_game_items()
-    cleared = set(cleared_items)
+    cleared = set(game_data.get("cleared_items", []))
     phase1_items = all_items - FINAL_ITEMS
 
     if phase1_items.issubset(cleared):
@@ -88,79 +150,117 @@ async def play_turn(game_id: str, file: UploadFile):
     if not remaining_items:
         raise HTTPException(status_code=400, detail="All items already cleared")
 
-    # 3. 写真アップロード
-    photo_bytes = await file.read()
+    return game_ref, game_data, all_items, remaining_items
+
+
+def _upload_original(
+    game_id: str, game_data: dict, photo_bytes: bytes, mime_type: str
+) -> tuple[str, str, str]:
+    """ターンの写真を GCS に保存し、(seq, gcs_path, public_url) を返す。"""
     photo_count = game_data.get("photo_count", 0) + 1
     seq = f"{photo_count:03d}"
     gcs_path = f"games/{game_id}/photos/{seq}_original.jpg"
     blob = bucket.blob(gcs_path)
-    blob.upload_from_string(photo_bytes, content_type=file.content_type or "image/jpeg")
+    blob.upload_from_string(photo_bytes, content_type=mime_type)
     blob.make_public()
-    original_url = blob.public_url
-
-    now = datetime.now(timezone.utc)
-
-    # 4. Vision 検出
-    detection = await _detect_item(photo_bytes, remaining_items)
+    return seq, gcs_path, blob.public_url
 
-    hint_messages = load_hint_messages()
-    detected_item = None
-    ghost_url = None
-    ghost_message = None
 
-    if detection.detected_item and detection.confidence in ("high", "medium"):
-        detected_item = detection.detected_item
-
-    # ヒントメッセージ取得
-    if detected_item:
-        hint_message = hint_messages.get(detected_item, "")
-    else:
-        hint_message = hint_messages.get("none", "")
-
-    # 5. Ghost 合成（常に生成）
-    try:
-        ghost_url, ghost_message = await _generate_ghost(
-            photo_bytes,
-            avatar_url,
-            hint_message,
-            detected_item,
-            game_id,
-            seq,
-        )
-    except Exception:
-        logger.exception("Ghost generation failed")
+async def _store_original(
+    game_id: str,
+    game_data: dict,
+    photo_bytes: bytes,
+    mime_type: str,
+    photo_part: types.Part | None = None,
+) -> tuple[tuple[str, str, str], types.Part]:
+    """GCS への保存と Files API へのアップロードを並行して行う。
+
+    ((seq, gcs_path, public_url), 写真の Part) を返す。photo_part を渡した場合は
+    アップロードせずにそれを使う。
+    """
+    original = asyncio.to_thread(
+        _upload_original, game_id, game_data, photo_bytes, mime_type
+    )
+    if photo_part is not None:
+        return await original, photo_part
+    return await asyncio.gather(original, media.image_part(photo_bytes, mime_type))
 
-    # 6. ゲーム状態更新
-    update_data: dict = {
-        "photo_count": photo_count,
-        "updated_at": now,
-    }
 
+def _save_turn(
+    game_id: str,
+    game_ref,
+    game_data: dict,
+    all_items: set[str],
+    gcs_path: str,
+    original_url: str,
+    derivative_urls: dict,
+    detected_item: str | None,
+    ghost: StoredImage | None,
+    ghost_message: str | None,
+    ghost_model: str | None,
+    now: datetime,
+) -> TurnResponse:
+    """写真レコード保存 + イベント追記を行い、ターンの結果を返す。
+
+    ゲーム状態はイベントから投影される。
+    """
+    cleared_items: list[str] = game_data.get("cleared_items", [])
     if detected_item:
         cleared_items = list(set(cleared_items) | {detected_item})
-        update_data["cleared_items"] = ArrayUnion([detected_item])
 
     new_remaining = sorted(all_items - set(cleared_items))
     all_cleared = len(new_remaining) == 0
 
-    game_ref.update(update_data)
-
-    # 7. 写真レコード保存
     photo_ref = db.collection("photos").document()
+    ghost_url = ghost.url if ghost else None
     photo_data = {
         "game_id": game_id,
         "original_path": gcs_path,
         "original_url": original_url,
-        "ghost_path": None,
+        "ghost_path": ghost.path if ghost else None,
         "ghost_url": ghost_url,
         "ghost_gesture": None,
         "ghost_message": ghost_message,
+        "ghost_model": ghost_model,
         "detected_item": detected_item,
+        **derivative_urls,
         "created_at": now,
     }
-    photo_ref.set(photo_data)
+    if ghost:
+        photo_data.update(ghost.derivative_urls)
+        photo_data["ghost_bytes_original"] = ghost.original_bytes
+        photo_data["ghost_bytes_stored"] = ghost.stored_bytes
+
+    events = [
+        timeline.new_event(
+            "turn_played",
+            photo_id=photo_ref.id,
+            original_url=original_url,
+            thumbnail_url=photo_data.get("thumbnail_url"),
+            detected_item=detected_item,
+        )
+    ]
+    if detected_item:
+        events.append(timeline.new_event("item_cleared", item=detected_item))
+    if ghost:
+        events.append(
+            timeline.new_event(
+                "ghost_ready",
+                photo_id=photo_ref.id,
+                ghost_url=ghost_url,
+                ghost_thumbnail_url=photo_data.get("ghost_thumbnail_url"),
+                ghost_message=ghost_message,
+                detected_item=detected_item,
+            )
+        )
 
-    # 8. メッセージ生成
+    batch = db.batch()
+    batch.set(photo_ref, photo_data)
+    timeline.append(
+        game_ref, events, batch=batch, event_count=game_data.get("event_count", 0)
+    )
+
+    # メッセージ生成
     if all_cleared:
         message = "すべての手がかりが揃いました。犯人を指名してください。"
     elif detected_item:
@@ -181,17 +281,205 @@ async def play_turn(game_id: str, file: UploadFile):
         detected_item=detected_item,
         ghost_url=ghost_url,
         ghost_message=ghost_message,
+        ghost_model=ghost_model,
         cleared_items=cleared_items,
         items_remaining=new_remaining,
         game_status="playing",
         game_solved=False,
-        hint_message=hint_message,
+        hint_message=_hint_message(detected_item),
         message=message,
     )
 
 
+@router.post("/turn", response_model=TurnResponse)
+async def play_turn(game_id: str, file: UploadFile):
+    # 1-2. ゲーム検証 + 残りアイテム計算
+    game_ref, game_data, all_items, remaining_items = load_turn_state(game_id)
+    avatar_url: str | None = game_data.get("avatar_url")
+
+    # 3. 写真アップロード
+    photo_bytes = await file.read()
+    photo_mime_type = file.content_type or "image/jpeg"
+    # Vision 検出と Ghost 合成の両方で使うので Files API に一度だけアップロードする
+    (seq, gcs_path, original_url), photo_part = await _store_original(
+        game_id, game_data, photo_bytes, photo_mime_type
+    )
+    # サムネイル生成は Vision 検出・Ghost 合成と並行して進める
+    derivatives_task = asyncio.create_task(store_derivatives(gcs_path, photo_bytes))
+
+    now = datetime.now(timezone.utc)
+
+    # 4-5. Vision 検出 + Ghost 合成（エンジンはデプロイごとに TURN_ENGINE で選択）
+    engine_name = TURN_ENGINE if TURN_ENGINE in TURN_ENGINES else "two_call"
+    stats = metrics.turn_engines[engine_name]
+    started = time.perf_counter()
+    detected_item, ghost, ghost_message, ghost_model = await TURN_ENGINES[engine_name](
+        photo_part, avatar_url, remaining_items, game_id, seq, stats
+    )
+    stats.turns += 1
+    stats.hits += detected_item is not None
+    stats.latencies_s.append(time.perf_counter() - started)
+
+    # 6-7. 写真レコード保存 + イベント追記 + メッセージ生成
+    return _save_turn(
+        game_id,
+        game_ref,
+        game_data,
+        all_items,
+        gcs_path,
+        original_url,
+        await derivatives_task,
+        detected_item,
+        ghost,
+        ghost_message,
+        ghost_model,
+        now,
+    )
+
+
+async def complete_turn(
+    game_id: str,
+    game_ref,
+    game_data: dict,
+    all_items: set[str],
+    photo_bytes: bytes,
+    photo_mime_type: str,
+    photo_part: types.Part | None,
+    detected_item: str | None,
+    stats: metrics.TurnEngineStats,
+    started: float,
+) -> TurnResponse:
+    """検出済みの写真を保存し、幽霊を合成してターンを記録する。
+
+    連写ターンとライブビューファインダーのように検出を別に済ませた経路で使う。
+    photo_part が None なら写真を Files API にアップロードして使う。
+    """
+    (seq, gcs_path, original_url), photo_part = await _store_original(
+        game_id, game_data, photo_bytes, photo_mime_type, photo_part
+    )
+    derivatives_task = asyncio.create_task(store_derivatives(gcs_path, photo_bytes))
+    now = datetime.now(timezone.utc)
+
+    ghost: StoredImage | None = None
+    ghost_message = ghost_model = None
+    try:
+        ghost, ghost_message, ghost_model = await _generate_ghost(
+            photo_part,
+            game_data.get("avatar_url"),
+            _hint_message(detected_item),
+            detected_item,
+            game_id,
+            seq,
+        )
+    except Exception:
+        logger.exception("Ghost generation failed")
+        stats.ghost_failures += 1
+    stats.turns += 1
+    stats.hits += detected_item is not None
+    stats.latencies_s.append(time.perf_counter() - started)
+
+    return _save_turn(
+        game_id,
+        game_ref,
+        game_data,
+        all_items,
+        gcs_path,
+        original_url,
+        await derivatives_task,
+        detected_item,
+        ghost,
+        ghost_message,
+        ghost_model,
+        now,
+    )
+
+
+@router.post("/turn/burst", response_model=BurstTurnResponse)
+async def play_burst_turn(game_id: str, files: list[UploadFile]):
+    """連写した複数枚の写真で 1 ターンを行う。
+
+    全フレームを 1 回の Vision リクエストで判定し、最も確信度の高いフレームだけを
+    保存して幽霊を合成する。
+    """
+    if not 1 <= len(files) <= MAX_BURST_FRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Burst must contain 1-{MAX_BURST_FRAMES} photos",
+        )
+    game_ref, game_data, all_items, remaining_items = load_turn_state(game_id)
+
+    frames = [(await f.read(), f.content_type or "image/jpeg") for f in files]
+    # 選ばれたフレームは幽霊合成でも使うので、全フレームを Files API に上げて
+    # 判定と合成で同じハンドルを参照する
+    frame_parts = await asyncio.gather(
+        *(media.image_part(data, mime_type) for data, mime_type in frames)
+    )
+
+    stats = metrics.turn_engines["burst"]
+    started = time.perf_counter()
+    detections = await _detect_item_burst(frame_parts, remaining_items)
+    frame_index = _best_frame(detections)
+
+    # 選ばれたフレームだけを保存して幽霊を合成する
+    photo_bytes, photo_mime_type = frames[frame_index]
+    result = await complete_turn(
+        game_id,
+        game_ref,
+        game_data,
+        all_items,
+        photo_bytes,
+        photo_mime_type,
+        frame_parts[frame_index],
+        accepted_item(detections[frame_index]),
+        stats,
+        started,
+    )
+    return BurstTurnResponse(
+        **result.model_dump(),
+        frame_index=frame_index,
+        frame_count=len(frames),
+    )
+
+
+def _hint_message(detected_item: str | None) -> str:
+    hint_messages = load_hint_messages()
+    return hint_messages.get(detected_item or "none", "")
+
+
+def accepted_item(detection: VisionDetectionResult) -> str | None:
+    if detection.detected_item and detection.confidence in ("high", "medium"):
+        return detection.detected_item
+    return None
+
+
+def validate_detection(
+    result: dict, remaining_items: list[str]
+) -> VisionDetectionResult:
+    # detected_item が残りアイテムに含まれない場合は未検出扱い
+    if result.get("detected_item") and result["detected_item"] not in remaining_items:
+        result["detected_item"] = None
+        result["confidence"] = "none"
+    return VisionDetectionResult(**result)
+
+
+def _split_image_response(
+    response: types.GenerateContentResponse,
+) -> tuple[bytes | None, str, list[str]]:
+    """画像生成レスポンスを (画像データ, MIME タイプ, テキストパート) に分ける。"""
+    image_data = None
+    mime_type = "image/png"
+    texts: list[str] = []
+    for part in response.candidates[0].content.parts:
+        if part.inline_data:
+            image_data = part.inline_data.data
+            mime_type = part.inline_data.mime_type or "image/png"
+        elif part.text:
+            texts.append(part.text)
+    return image_data, mime_type, texts
+
+
 async def _detect_item(
-    photo_bytes: bytes, remaining_items: list[str]
+    photo_part: types.Part, remaining_items: list[str]
 ) -> VisionDetectionResult:
     """Gemini Vision でアイテムを検出する。"""
     prompt = _build_vision_prompt(remaining_items)
@@ -199,7 +487,7 @@ async def _detect_item(
     response = await client.aio.models.generate_content(
         model="gemini-2.5-flash",
         contents=[
-            types.Part.from_bytes(data=photo_bytes, mime_type="image/jpeg"),
+            photo_part,
             types.Part.from_text(text=prompt),
         ],
         config=types.GenerateContentConfig(
@@ -209,15 +497,7 @@ async def _detect_item(
     )
 
     try:
-        result = json.loads(response.text)
-        # detected_item が残りアイテムに含まれない場合は未検出扱い
-        if (
-            result.get("detected_item")
-            and result["detected_item"] not in remaining_items
-        ):
-            result["detected_item"] = None
-            result["confidence"] = "none"
-        return VisionDetectionResult(**result)
+        return validate_detection(json.loads(response.text), remaining_items)
     except (json.JSONDecodeError, ValueError):
         logger.exception("Failed to parse vision detection result")
         return VisionDetectionResult(
@@ -225,55 +505,295 @@ async def _detect_item(
         )
 
 
+async def _detect_item_burst(
+    frame_parts: list[types.Part], remaining_items: list[str]
+) -> list[VisionDetectionResult]:
+    """1 回の Vision リクエストで連写の全フレームを判定する。フレーム順に返す。"""
+    contents: list[types.Part] = []
+    for i, part in enumerate(frame_parts):
+        contents.append(types.Part.from_text(text=f"フレーム {i}:"))
+        contents.append(part)
+    contents.append(
+        types.Part.from_text(
+            text=_build_burst_vision_prompt(remaining_items, len(frame_parts))
+        )
+    )
+
+    try:
+        response = await client.aio.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=contents,
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=BurstDetectionResult,
+            ),
+        )
+    except genai_errors.APIError:
+        # まとめた呼び出しが 429 などで失敗したらフレームごとに判定し直す
+        logger.exception("Burst detection failed; detecting frames one by one")
+        return await _detect_frames(frame_parts, remaining_items)
+
+    detections = [
+        VisionDetectionResult(
+            detected_item=None, confidence="none", explanation="No result"
+        )
+        for _ in frame_parts
+    ]
+    try:
+        for frame in json.loads(response.text).get("frames", []):
+            index = frame.pop("frame_index", None)
+            if isinstance(index, int) and 0 <= index < len(detections):
+                detections[index] = validate_detection(frame, remaining_items)
+    except (json.JSONDecodeError, ValueError, AttributeError, TypeError):
+        logger.exception("Failed to parse burst detection result")
+    return detections
+
+
+async def _detect_frames(
+    frame_parts: list[types.Part], remaining_items: list[str]
+) -> list[VisionDetectionResult]:
+    """フレームごとに Vision で判定する。失敗したフレームは未検出扱いにする。"""
+    results = await asyncio.gather(
+        *(_detect_item(part, remaining_items) for part in frame_parts),
+        return_exceptions=True,
+    )
+    detections = []
+    for result in results:
+        if isinstance(result, genai_errors.APIError):
+            logger.warning("Frame detection failed: %s", result)
+            result = VisionDetectionResult(
+                detected_item=None, confidence="none", explanation="Detection error"
+            )
+        elif isinstance(result, BaseException):
+            raise result
+        detections.append(result)
+    return detections
+
+
+def _best_frame(detections: list[VisionDetectionResult]) -> int:
+    """検出できたフレームのうち最も確信度の高いもの (同点なら先頭) の番号を返す。"""
+    return max(
+        range(len(detections)),
+        key=lambda i: (
+            accepted_item(detections[i]) is not None,
+            CONFIDENCE_RANK.get(detections[i].confidence, 0),
+            -i,
+        ),
+    )
+
+
 async def _generate_ghost(
-    photo_bytes: bytes,
+    photo_part: types.Part,
     avatar_url: str | None,
     hint_message: str,
     detected_item: str | None,
     game_id: str,
     seq: str,
-) -> tuple[str, str | None]:
-    """Gemini で幽霊画像を合成し、GCS にアップロードする。"""
+) -> tuple[StoredImage, str | None, str]:
+    """Gemini で幽霊画像を合成し、GCS にアップロードする。
+
+    (幽霊画像, メッセージ, 合成したモデル) を返す。
+    """
     has_avatar = avatar_url is not None
     prompt = _build_ghost_prompt(hint_message, detected_item, has_avatar)
 
     contents: list[types.Part] = []
     if avatar_url:
-        # GCS からアバター画像を取得して参照画像として添付
-        avatar_blob_name = avatar_url.split(f"/{bucket.name}/")[-1]
-        avatar_blob = bucket.blob(avatar_blob_name)
-        avatar_bytes = avatar_blob.download_as_bytes()
-        contents.append(types.Part.from_bytes(data=avatar_bytes, mime_type="image/png"))
-    contents.append(types.Part.from_bytes(data=photo_bytes, mime_type="image/jpeg"))
+        # アバター画像を参照画像として添付（ゲームごとにアップロード済みハンドルを再利用）
+        contents.append(await media.avatar_part(avatar_url))
+    contents.append(photo_part)
     contents.append(types.Part.from_text(text=prompt))
 
-    response = await client.aio.models.generate_content(
-        model="gemini-3-pro-image-preview",
-        contents=contents,
-        config=types.GenerateContentConfig(
+    # 主モデルが遅い・画像を返さない場合は速いモデルに切り替える
+    routed = await model_router.generate_image(
+        "turn",
+        contents,
+        types.GenerateContentConfig(
             response_modalities=["TEXT", "IMAGE"],
         ),
     )
 
-    ghost_image_data = None
-    ghost_mime_type = "image/png"
-    ghost_message = None
+    ghost_image_data, ghost_mime_type, texts = _split_image_response(routed.response)
+    ghost_message = texts[-1] if texts else None
 
-    for part in response.candidates[0].content.parts:
-        if part.inline_data:
-            ghost_image_data = part.inline_data.data
-            ghost_mime_type = part.inline_data.mime_type or "image/png"
-        elif part.text:
-            ghost_message = part.text
+    # 再エンコードして GCS にアップロード
+    ghost = await store_generated_image(
+        f"games/{game_id}/photos/{seq}_ghost",
+        ghost_image_data,
+        ghost_mime_type,
+        derivative_prefix="ghost_",
+    )
 
-    if not ghost_image_data:
-        raise RuntimeError("Ghost image generation returned no image data")
+    return ghost, ghost_message, routed.model
 
-    # GCS にアップロード
-    ext = "png" if "png" in ghost_mime_type else "jpg"
-    ghost_path = f"games/{game_id}/photos/{seq}_ghost.{ext}"
-    blob = bucket.blob(ghost_path)
-    blob.upload_from_string(ghost_image_data, content_type=ghost_mime_type)
-    blob.make_public()
 
-    return blob.public_url, ghost_message
+# --- Turn engines ---
+# どちらも (photo_part, avatar_url, remaining_items, game_id, seq, stats) を受け取り
+# (detected_item, ghost, ghost_message, ghost_model) を返す。
+
+
+async def _two_call_engine(
+    photo_part: types.Part,
+    avatar_url: str | None,
+    remaining_items: list[str],
+    game_id: str,
+    seq: str,
+    stats: metrics.TurnEngineStats,
+) -> tuple[str | None, StoredImage | None, str | None, str | None]:
+    """Vision 検出 → Ghost 合成の 2 回のモデル呼び出しで 1 ターンを処理する。"""
+    detection = await _detect_item(photo_part, remaining_items)
+    detected_item = accepted_item(detection)
+
+    # Ghost 合成（常に生成）
+    try:
+        ghost, ghost_message, ghost_model = await _generate_ghost(
+            photo_part,
+            avatar_url,
+            _hint_message(detected_item),
+            detected_item,
+            game_id,
+            seq,
+        )
+    except Exception:
+        logger.exception("Ghost generation failed")
+        stats.ghost_failures += 1
+        return detected_item, None, None, None
+    return detected_item, ghost, ghost_message, ghost_model
+
+
+def parse_detection_text(
+    texts: list[str], remaining_items: list[str]
+) -> tuple[VisionDetectionResult | None, str | None]:
+    """モデルのテキスト出力から判定 JSON を取り出す。
+
+    統合エンジンでは判定 JSON 以外のテキストが幽霊のメッセージになる。
+    """
+    for i, text in enumerate(texts):
+        match = _JSON_OBJECT_RE.search(text)
+        if not match:
+            continue
+        try:
+            detection = validate_detection(json.loads(match.group(0)), remaining_items)
+        except (json.JSONDecodeError, ValueError):
+            continue
+        rest = [t for j, t in enumerate(texts) if j != i]
+        rest.append(text[: match.start()] + text[match.end() :])
+        message = "\n".join(t.strip() for t in rest if t.strip()) or None
+        return detection, message
+    return None, None
+
+
+async def _fused_engine(
+    photo_part: types.Part,
+    avatar_url: str | None,
+    remaining_items: list[str],
+    game_id: str,
+    seq: str,
+    stats: metrics.TurnEngineStats,
+) -> tuple[str | None, StoredImage | None, str | None, str | None]:
+    """画像モデル 1 回の呼び出しで検出結果 (テキスト) と幽霊画像を同時に得る。
+
+    判定 JSON が読めない場合は Vision 検出で補い、アイテムが見つかった場合は
+    ジェスチャーが合わないので 2 段階エンジンで幽霊を作り直す。
+    """
+    contents: list[types.Part] = []
+    if avatar_url:
+        contents.append(await media.avatar_part(avatar_url))
+    contents.append(photo_part)
+    contents.append(
+        types.Part.from_text(
+            text=_build_fused_prompt(remaining_items, avatar_url is not None)
+        )
+    )
+
+    try:
+        routed = await model_router.generate_image(
+            "turn",
+            contents,
+            types.GenerateContentConfig(
+                response_modalities=["TEXT", "IMAGE"],
+            ),
+        )
+    except model_router.ModelRoutingError:
+        # 全段が失敗した状態で合成をやり直しても待ち時間が延びるだけなので、検出だけ行う
+        logger.exception("Fused turn call failed; detecting without a ghost")
+        stats.fallbacks += 1
+        stats.ghost_failures += 1
+        detection = await _detect_item(photo_part, remaining_items)
+        return accepted_item(detection), None, None, None
+
+    image_data, mime_type, texts = _split_image_response(routed.response)
+    detection, ghost_message = parse_detection_text(texts, remaining_items)
+
+    if detection is None:
+        logger.warning("Fused turn returned no parsable detection: %r", texts)
+        stats.parse_failures += 1
+        detection = await _detect_item(photo_part, remaining_items)
+        ghost_message = None
+        if accepted_item(detection):
+            stats.fallbacks += 1
+            try:
+                ghost, ghost_message, ghost_model = await _generate_ghost(
+                    photo_part,
+                    avatar_url,
+                    _hint_message(detection.detected_item),
+                    detection.detected_item,
+                    game_id,
+                    seq,
+                )
+                return detection.detected_item, ghost, ghost_message, ghost_model
+            except Exception:
+                logger.exception("Fallback ghost generation failed")
+    elif metrics.sample(TURN_ENGINE_SHADOW_RATE):
+        # 一部のターンは Vision 専用モデルでも判定し、精度を比較する
+        _spawn(
+            _shadow_check(
+                photo_part, remaining_items, accepted_item(detection), stats
+            )
+        )
+
+    detected_item = accepted_item(detection)
+
+    try:
+        ghost = await store_generated_image(
+            f"games/{game_id}/photos/{seq}_ghost",
+            image_data,
+            mime_type,
+            derivative_prefix="ghost_",
+        )
+    except Exception:
+        logger.exception("Ghost upload failed")
+        stats.ghost_failures += 1
+        return detected_item, None, ghost_message, None
+    return detected_item, ghost, ghost_message, routed.model
+
+
+async def _shadow_check(
+    photo_part: types.Part,
+    remaining_items: list[str],
+    detected_item: str | None,
+    stats: metrics.TurnEngineStats,
+) -> None:
+    """統合エンジンの判定を Vision 専用モデルの判定と比べ、一致率を記録する。"""
+    try:
+        reference = accepted_item(await _detect_item(photo_part, remaining_items))
+    except Exception:
+        logger.exception("Shadow detection failed")
+        return
+    stats.shadow_checks += 1
+    stats.shadow_agreements += reference == detected_item
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+TURN_ENGINES = {
+    "two_call": _two_call_engine,
+    "fused": _fused_engine,
+}
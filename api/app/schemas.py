@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Any
 
 from pydantic import BaseModel
 
@@ -42,7 +43,12 @@ class PhotoResponse(BaseModel):
     ghost_url: str | None = None
     ghost_gesture: str | None = None
     ghost_message: str | None = None
+    ghost_model: str | None = None  # 幽霊画像を合成したモデル (フォールバック時は速い方)
     detected_item: str | None = None
+    thumbnail_url: str | None = None
+    preview_url: str | None = None
+    ghost_thumbnail_url: str | None = None
+    ghost_preview_url: str | None = None
     created_at: datetime
 
 
@@ -67,6 +73,14 @@ class VisionDetectionResult(BaseModel):
     explanation: str
 
 
+class FrameDetection(VisionDetectionResult):
+    frame_index: int
+
+
+class BurstDetectionResult(BaseModel):
+    frames: list[FrameDetection]
+
+
 class TurnResponse(BaseModel):
     game_id: str
     photo_id: str
@@ -74,6 +88,7 @@ class TurnResponse(BaseModel):
     detected_item: str | None = None
     ghost_url: str | None = None
     ghost_message: str | None = None
+    ghost_model: str | None = None
     cleared_items: list[str]
     items_remaining: list[str]
     game_status: str  # "playing" | "solved"
@@ -82,6 +97,34 @@ class TurnResponse(BaseModel):
     message: str
 
 
+class BurstTurnResponse(TurnResponse):
+    frame_index: int  # 採用した (保存・幽霊合成した) フレームの番号
+    frame_count: int
+
+
+# --- Timeline ---
+
+
+class TimelineEvent(BaseModel):
+    id: str
+    type: str  # "game_created" | "turn_played" | "item_cleared" | "ghost_ready" | ...
+    data: dict[str, Any] = {}
+    created_at: datetime
+
+
+class TimelineResponse(BaseModel):
+    events: list[TimelineEvent]
+    next_cursor: str | None = None
+
+
+class TimelineStateResponse(BaseModel):
+    event_id: str
+    status: str | None = None
+    photo_count: int = 0
+    avatar_url: str | None = None
+    cleared_items: list[str] = []
+
+
 # --- Accusation ---
 
 
@@ -106,6 +149,7 @@ class AccusationResponse(BaseModel):
 class GenerateRequest(BaseModel):
     prompt: str
     model: str = "gemini-2.5-flash"
+    temperature: float | None = None  # 0 のとき応答をキャッシュする
 
 
 class GenerateResponse(BaseModel):
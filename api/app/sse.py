@@ -0,0 +1,18 @@
+"""Server-Sent Events の整形。"""
+
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+# 中継プロキシに接続を切られないよう定期的に送るコメント行
+PING = ": ping\n\n"
+
+
+def format_event(data: dict, event: str | None = None, event_id: str | None = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
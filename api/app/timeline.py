@@ -0,0 +1,212 @@
+"""ゲームごとの追記専用イベントログ。
+
+`games/{id}/events/{event_id}` にイベントを追記し、同じバッチで games ドキュメント
+(現在状態のプロジェクション) をフィールド変換 (ArrayUnion / Increment) で更新する。
+現在状態は games ドキュメントを 1 回読むだけで得られ、履歴はイベントログを
+カーソルで順に読むことで得られる。
+
+一定件数ごとに `games/{id}/snapshots/{event_id}` に状態のスナップショットを書き、
+任意時点の状態をスナップショット + 以降のイベントから復元できるようにする。
+"""
+
+import copy
+import uuid
+from datetime import datetime, timezone
+from typing import Any
+
+from google.cloud.firestore_v1 import ArrayUnion, Increment
+
+from app.config import TIMELINE_SNAPSHOT_INTERVAL
+from app.firebase import db
+
+# スナップショットに含める状態フィールド
+STATE_FIELDS = (
+    "player_name",
+    "status",
+    "photo_count",
+    "ghost_description",
+    "avatar_url",
+    "cleared_items",
+)
+
+
+class IncompleteHistory(Exception):
+    """イベントログがゲーム作成から始まっておらず、過去の状態を復元できない。"""
+
+
+def new_event(type_: str, **data: Any) -> dict:
+    return {"type": type_, "data": data}
+
+
+def _event_ids(now: datetime, count: int) -> list[str]:
+    """辞書順 = 時系列順になるイベント ID を発行する。"""
+    micros = int(now.timestamp() * 1_000_000)
+    suffix = uuid.uuid4().hex[:8]
+    return [f"{micros + i:017d}-{suffix}" for i in range(count)]
+
+
+def projection_updates(event: dict) -> dict:
+    """イベントを games ドキュメントへのフィールド更新に変換する (読み取り不要)。"""
+    data = event["data"]
+    match event["type"]:
+        case "turn_played" | "photo_uploaded":
+            return {"photo_count": Increment(1)}
+        case "item_cleared":
+            return {"cleared_items": ArrayUnion([data["item"]])}
+        case "avatar_ready":
+            return {"avatar_url": data["avatar_url"]}
+        case "status_changed":
+            return {"status": data["status"]}
+        case "accusation_made" if data.get("correct"):
+            return {"status": "solved"}
+    return {}
+
+
+def apply_event(state: dict, event: dict) -> dict:
+    """projection_updates と同じ規則でイベントを状態に適用する (リプレイ用)。"""
+    data = event["data"]
+    state = copy.deepcopy(state)
+    match event["type"]:
+        case "game_created":
+            state.update({k: data.get(k) for k in STATE_FIELDS if k in data})
+        case "turn_played" | "photo_uploaded":
+            state["photo_count"] = state.get("photo_count", 0) + 1
+        case "item_cleared":
+            cleared = state.setdefault("cleared_items", [])
+            if data["item"] not in cleared:
+                cleared.append(data["item"])
+        case "avatar_ready":
+            state["avatar_url"] = data["avatar_url"]
+        case "status_changed":
+            state["status"] = data["status"]
+        case "accusation_made" if data.get("correct"):
+            state["status"] = "solved"
+    return state
+
+
+def append(
+    game_ref,
+    events: list[dict],
+    batch=None,
+    updates: dict | None = None,
+    *,
+    event_count: int,
+) -> list[str]:
+    """イベントを追記し、プロジェクションを同じバッチで更新して commit する。
+
+    batch を渡すと呼び出し元の書き込みも同じバッチでアトミックに commit される。
+    ゲームの状態は読まず、フィールド変換だけで更新する。event_count には呼び出し元が
+    読んだ games ドキュメントの event_count (新規作成なら 0) を渡す。
+    """
+    now = datetime.now(timezone.utc)
+    batch = batch or db.batch()
+    event_ids = _event_ids(now, len(events))
+    events_ref = game_ref.collection("events")
+
+    projection: dict = {}
+    for event_id, event in zip(event_ids, events):
+        batch.set(events_ref.document(event_id), {**event, "created_at": now})
+        for key, value in projection_updates(event).items():
+            if isinstance(value, ArrayUnion) and isinstance(projection.get(key), ArrayUnion):
+                value = ArrayUnion(projection[key].values + value.values)
+            elif isinstance(value, Increment) and isinstance(projection.get(key), Increment):
+                value = Increment(projection[key].value + value.value)
+            projection[key] = value
+
+    batch.update(
+        game_ref,
+        {
+            **projection,
+            **(updates or {}),
+            "event_count": Increment(len(events)),
+            "last_event_id": event_ids[-1],
+            "updated_at": now,
+        },
+    )
+    batch.commit()
+
+    _maybe_snapshot(game_ref, event_count, event_count + len(events))
+    return event_ids
+
+
+def _maybe_snapshot(game_ref, before: int, after: int) -> None:
+    """この追記で TIMELINE_SNAPSHOT_INTERVAL 件の境界を越えたらスナップショットを書く。
+
+    件数は呼び出し元が読んだ値からの見込みなので追記のたびに読み直さない。
+    同時に追記されると境界を取りこぼすことがあるが、その場合は前のスナップショットから
+    少し多くイベントを読むだけで、復元される状態は変わらない。
+    """
+    if after // TIMELINE_SNAPSHOT_INTERVAL <= before // TIMELINE_SNAPSHOT_INTERVAL:
+        return
+
+    # 同時に追記されると last_event_id は最後に commit した側の ID になるので、ログの末尾を使う
+    event_id = latest_event_id(game_ref.id)
+    try:
+        state = state_at(game_ref.id, event_id)
+    except IncompleteHistory:
+        return  # タイムライン導入前のゲームは正しい状態を復元できない
+    batch = db.batch()
+    batch.set(
+        game_ref.collection("snapshots").document(event_id),
+        {
+            "state": state,
+            "event_count": after,
+            "created_at": datetime.now(timezone.utc),
+        },
+    )
+    batch.commit()
+
+
+def list_events(game_id: str, after: str | None = None, limit: int = 100) -> list:
+    """after より後のイベントを時系列順に最大 limit 件返す。"""
+    query = db.collection("games").document(game_id).collection("events").order_by("__name__")
+    if after:
+        query = query.start_after({"__name__": after})
+    return list(query.limit(limit).stream())
+
+
+def latest_event_id(game_id: str) -> str | None:
+    """イベントログの末尾の ID (イベントがなければ None)。"""
+    latest = list(
+        db.collection("games")
+        .document(game_id)
+        .collection("events")
+        .order_by("__name__", direction="DESCENDING")
+        .limit(1)
+        .stream()
+    )
+    return latest[0].id if latest else None
+
+
+def state_at(game_id: str, event_id: str) -> dict:
+    """event_id 時点の状態を、直前のスナップショット + 以降のイベントから復元する。
+
+    event_id が最初のイベントより前なら空の状態 (ゲーム作成前) を返す。
+    ログが game_created で始まらない (タイムライン導入前に作られた) ゲームは
+    IncompleteHistory を送出する。
+    """
+    game_ref = db.collection("games").document(game_id)
+    snapshots = list(
+        game_ref.collection("snapshots")
+        .where("__name__", "<=", game_ref.collection("snapshots").document(event_id))
+        .order_by("__name__", direction="DESCENDING")
+        .limit(1)
+        .stream()
+    )
+    if snapshots:
+        state = snapshots[0].to_dict()["state"]
+        cursor = snapshots[0].id
+    else:
+        state, cursor = {}, None
+
+    while True:
+        page = list_events(game_id, after=cursor)
+        if cursor is None and page and page[0].to_dict().get("type") != "game_created":
+            raise IncompleteHistory(game_id)
+        for doc in page:
+            if doc.id > event_id:
+                return state
+            state = apply_event(state, doc.to_dict())
+        if len(page) < 100:
+            return state
+        cursor = page[-1].id
@@ -0,0 +1,8 @@
+"""Offline benchmark harness.
+
+実際の FastAPI アプリを、Firestore / GCS / genai.Client のインメモリ代替に
+差し替えて駆動する。認証情報やネットワークなしでラップトップ上で再現可能な
+性能計測を行うためのもの。
+
+    uv run python -m bench.run --games 8 --turns 6
+"""
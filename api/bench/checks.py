@@ -0,0 +1,335 @@
+"""Regression checks for behaviour that latency numbers alone do not show.
+
+    uv run python -m bench.checks
+
+フェイクバックエンドで app を起動し、登録されたチェックを順に実行する。
+各チェックは失敗すると AssertionError を送出する。1 つでも失敗すれば終了コード 1 を返す。
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import sys
+import time
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from bench.fakes import FakeBackends, make_png, make_profile
+from bench.harness import BenchClient, Recorder, bench_client, install_fakes
+
+
+@dataclass
+class Context:
+    backends: FakeBackends
+    app: object
+    client: BenchClient
+
+
+CHECKS = []
+
+
+def check(fn):
+    CHECKS.append(fn)
+    return fn
+
+
+# --- recorder ---
+
+
+class _SlowIterator:
+    """Firestore の StreamGenerator と同じく、ネイティブのジェネレータではないイテレータ。"""
+
+    def __init__(self, items: int, delay_s: float):
+        self.items = items
+        self.delay_s = delay_s
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.items == 0:
+            raise StopIteration
+        self.items -= 1
+        time.sleep(self.delay_s)
+        return self.items
+
+
+class _SlowAsyncIterator:
+    def __init__(self, items: int, delay_s: float):
+        self.items = items
+        self.delay_s = delay_s
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.items == 0:
+            raise StopAsyncIteration
+        self.items -= 1
+        await asyncio.sleep(self.delay_s)
+        return self.items
+
+
+@check
+async def recorder_times_iteration(ctx: Context) -> None:
+    """stream() と generate_content_stream() は読み切るまでの時間が記録される。"""
+    from app import recorder
+
+    async def open_stream(**_):
+        return _SlowAsyncIterator(3, 0.02)
+
+    calls: list = []
+    calls_token = recorder._calls.set(calls)
+    started_token = recorder._started.set(time.perf_counter())
+    try:
+        list(recorder._traced(lambda: _SlowIterator(3, 0.02), "firestore_read")())
+        stream = await recorder._traced(open_stream, "gemini")(model="m")
+        async for _ in stream:
+            pass
+    finally:
+        recorder._calls.reset(calls_token)
+        recorder._started.reset(started_token)
+
+    assert [c[0] for c in calls] == ["firestore_read", "gemini:m"], calls
+    for kind, _start, duration_ms, ok in calls:
+        assert duration_ms >= 50 and ok == 1, (kind, duration_ms, ok)
+
+
+# --- turn ---
+
+
+async def _new_game(ctx: Context) -> str:
+    res = await ctx.client.request("POST /game/", "POST", "/game/", json={"player_name": "check"})
+    assert res.status_code == 200, res.text
+    return res.json()["id"]
+
+
+@check
+async def burst_survives_rate_limit(ctx: Context) -> None:
+    """まとめた Vision 呼び出しが 429 でもフレームごとの判定でターンが成立する。"""
+    from google.genai import errors
+
+    from app.schemas import BurstDetectionResult
+
+    game_id = await _new_game(ctx)
+    models = ctx.backends.genai.aio.models
+    generate_content = models.generate_content
+
+    async def rate_limited_burst(**kwargs):
+        config = kwargs.get("config")
+        if config is not None and config.response_schema is BurstDetectionResult:
+            raise errors.ClientError(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}})
+        return await generate_content(**kwargs)
+
+    models.generate_content = rate_limited_burst
+    try:
+        photo = make_png(64)
+        res = await ctx.client.request(
+            "POST /game/{id}/turn/burst",
+            "POST",
+            f"/game/{game_id}/turn/burst",
+            files=[("files", (f"photo{i}.png", photo, "image/png")) for i in range(3)],
+        )
+    finally:
+        del models.generate_content
+    assert res.status_code == 200, (res.status_code, res.text)
+    assert res.json()["frame_count"] == 3, res.json()
+
+
+@check
+async def regenerated_avatar_gets_new_handle(ctx: Context) -> None:
+    """アバターを再生成すると、キャッシュ済みの Files API ハンドルを使い回さない。"""
+    from app import media
+
+    game_id = await _new_game(ctx)
+    handles = []
+    for _ in range(2):
+        res = await ctx.client.request("POST /game/{id}/avatar", "POST", f"/game/{game_id}/avatar")
+        assert res.status_code == 200, res.text
+        part = await media.avatar_part(res.json()["avatar_url"])
+        handles.append(part.file_data.file_uri)
+    assert handles[0] != handles[1], handles
+
+
+# --- timeline ---
+
+
+@check
+async def timeline_append_does_not_read(ctx: Context) -> None:
+    """追記は games ドキュメントを読み直さず、境界を越えたときだけスナップショットを書く。"""
+    from app import timeline
+    from app.config import TIMELINE_SNAPSHOT_INTERVAL
+
+    game_id = await _new_game(ctx)
+    game_ref = ctx.backends.db.collection("games").document(game_id)
+    for count in range(1, TIMELINE_SNAPSHOT_INTERVAL - 1):
+        reads = ctx.backends.db.reads
+        timeline.append(game_ref, [timeline.new_event("photo_uploaded")], event_count=count)
+        assert ctx.backends.db.reads == reads, f"append #{count} read {ctx.backends.db.reads - reads}"
+    assert not list(game_ref.collection("snapshots").stream())
+
+    timeline.append(
+        game_ref,
+        [timeline.new_event("status_changed", status="playing")],
+        event_count=TIMELINE_SNAPSHOT_INTERVAL - 1,
+    )
+    snapshots = list(game_ref.collection("snapshots").stream())
+    assert len(snapshots) == 1, snapshots
+    state = snapshots[0].to_dict()["state"]
+    assert state["photo_count"] == TIMELINE_SNAPSHOT_INTERVAL - 2, state
+    assert state["status"] == "playing", state
+
+
+@check
+async def legacy_timeline_state_conflicts(ctx: Context) -> None:
+    """イベントログ導入前のゲームは、空の状態ではなく 409 を返す。"""
+    game_ref = ctx.backends.db.collection("games").document("legacy-check")
+    game_ref.set(
+        {
+            "player_name": "legacy",
+            "status": "playing",
+            "photo_count": 3,
+            "cleared_items": [],
+            "created_at": datetime.now(timezone.utc),
+        }
+    )
+    res = await ctx.client.request(
+        "PATCH /game/{id}", "PATCH", f"/game/{game_ref.id}", json={"status": "playing"}
+    )
+    assert res.status_code == 200, res.text
+    event_id = game_ref.get().to_dict()["last_event_id"]
+    res = await ctx.client.request(
+        "GET /game/{id}/timeline/state", "GET", f"/game/{game_ref.id}/timeline/state", params={"at": event_id}
+    )
+    assert res.status_code == 409, (res.status_code, res.text)
+
+
+# --- gemini ---
+
+
+@check
+async def generate_image_reports_routing_failure(ctx: Context) -> None:
+    """すべての画像モデルが失敗したら 200 の空画像ではなく 502 を返す。"""
+    profile = ctx.backends.profile
+    rate_limit_rate, profile.rate_limit_rate = profile.rate_limit_rate, 1.0
+    try:
+        res = await ctx.client.request(
+            "POST /gemini/generate-image", "POST", "/gemini/generate-image", json={"prompt": "check"}
+        )
+    finally:
+        profile.rate_limit_rate = rate_limit_rate
+    assert res.status_code == 502, (res.status_code, res.text)
+
+
+# --- cache ---
+
+
+@check
+async def shared_cache_does_not_wait_for_lock(ctx: Context) -> None:
+    """他のワーカーが書き込みロックを持っていても、待たずにミスとして返る。"""
+    import sqlite3
+    import tempfile
+
+    from app.cache import SharedCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SharedCache(f"{tmp}/cache.sqlite", "check", 16, 60)
+        cache.set("warm", 1)
+        other = sqlite3.connect(f"{tmp}/cache.sqlite", isolation_level=None)
+        other.execute("BEGIN EXCLUSIVE")
+        try:
+            started = time.perf_counter()
+            cache.set("key", 1)
+            elapsed = time.perf_counter() - started
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+        assert elapsed < 0.1, f"set blocked for {elapsed * 1000:.0f}ms"
+        assert cache.locked == 1, cache.snapshot()
+        assert cache.get("key") is None
+        assert cache.get("warm") == 1
+
+
+# --- live ---
+
+
+class _WebSocket:
+    """ASGI の WebSocket スコープで app を直接駆動するクライアント。"""
+
+    def __init__(self, app, path: str):
+        self._incoming: asyncio.Queue = asyncio.Queue()
+        self._outgoing: asyncio.Queue = asyncio.Queue()
+        self._incoming.put_nowait({"type": "websocket.connect"})
+        scope = {"type": "websocket", "path": path, "headers": [], "query_string": b"", "subprotocols": []}
+        self.task = asyncio.create_task(app(scope, self._incoming.get, self._outgoing.put))
+
+    def send_text(self, text: str) -> None:
+        self._incoming.put_nowait({"type": "websocket.receive", "text": text})
+
+    async def receive_json(self, timeout_s: float = 5.0) -> dict:
+        while True:
+            message = await asyncio.wait_for(self._outgoing.get(), timeout_s)
+            if message["type"] == "websocket.send":
+                return json.loads(message["text"])
+
+    async def close(self) -> None:
+        self._incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, 5.0)
+
+
+@check
+async def live_skips_malformed_messages(ctx: Context) -> None:
+    """壊れたメッセージを受けてもライブセッションは続き、次のフレームを判定する。"""
+    game_id = await _new_game(ctx)
+    profile = ctx.backends.profile
+    # ターンまで進めず判定だけを確認する
+    detect_hit_rate, profile.detect_hit_rate = profile.detect_hit_rate, 0.0
+    ws = _WebSocket(ctx.app, f"/ws/live/{game_id}")
+    try:
+        assert (await ws.receive_json())["type"] == "ready"
+        for text in ("not json", "[]", '{"type": "image"}', '{"type": "image", "data": "%%%"}'):
+            ws.send_text(text)
+        ws.send_text(json.dumps({"type": "image", "data": base64.b64encode(make_png(32)).decode()}))
+        message = await ws.receive_json()
+    finally:
+        profile.detect_hit_rate = detect_hit_rate
+        await ws.close()
+    assert message["type"] == "detection", message
+
+
+async def run(backends: FakeBackends, app, names: list[str]) -> int:
+    failures = 0
+    async with bench_client(app, Recorder()) as client:
+        ctx = Context(backends, app, client)
+        for fn in CHECKS:
+            if names and fn.__name__ not in names:
+                continue
+            try:
+                await fn(ctx)
+            except Exception:
+                failures += 1
+                print(f"FAIL {fn.__name__}")
+                traceback.print_exc()
+            else:
+                print(f"ok   {fn.__name__}")
+    return failures
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("names", nargs="*", help="実行するチェック名 (省略時はすべて)")
+    parser.add_argument("--verbose", action="store_true", help="app のログ (例外トレース) を表示")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    backends = FakeBackends.create(make_profile("zero"))
+    app = install_fakes(backends)
+    if asyncio.run(run(backends, app, args.names)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
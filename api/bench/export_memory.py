@@ -0,0 +1,141 @@
+"""Check that GET /game/{id}/export streams within a fixed memory ceiling.
+
+    uv run python -m bench.export_memory --photos 200 --image-kb 2048
+
+写真 N 枚 (+ 同数の幽霊画像) を持つ合成ゲームをフェイク GCS に用意し、エクスポートを
+最後まで読み出す。レスポンスは ASGI アプリを直接呼んで受け取り、ファイルに書き出すだけで
+保持しない (httpx の ASGITransport は本体をバッファするため使わない)。
+tracemalloc で計測したエクスポート中のピーク割り当てが上限を超えれば終了コード 1 を返す。
+上限の既定値は (EXPORT_CONCURRENCY + 4) × 画像サイズ + 16 MiB で、写真の枚数には依存しない。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta, timezone
+
+from bench.fakes import PROFILES, FakeBackends, make_profile
+from bench.harness import install_fakes
+
+MiB = 1024 * 1024
+
+
+def seed_game(backends: FakeBackends, photos: int, image_bytes: int) -> str:
+    game_id = "export-bench"
+    now = datetime.now(timezone.utc)
+    backends.db.collection("games").document(game_id).set(
+        {"player_name": "bench", "status": "solved", "created_at": now, "updated_at": now}
+    )
+    for i in range(photos):
+        seq = f"{i + 1:03d}"
+        original = f"games/{game_id}/photos/{seq}_original.jpg"
+        ghost = f"games/{game_id}/photos/{seq}_original_ghost.png"
+        for path in (original, ghost):
+            backends.bucket._objects[path] = {
+                "data": os.urandom(image_bytes),
+                "content_type": "image/jpeg",
+                "updated": now,
+            }
+        backends.db.collection("photos").document(f"photo-{seq}").set(
+            {
+                "game_id": game_id,
+                "original_path": original,
+                "ghost_path": ghost,
+                "ghost_message": f"メッセージ {seq}",
+                "created_at": now + timedelta(seconds=i),
+            }
+        )
+    return game_id
+
+
+async def export(app, game_id: str, out) -> tuple[int, int, float]:
+    """ASGI アプリから直接エクスポートを受け取り out に書く。(status, bytes, 最初のチャンクまでの秒数)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/game/{game_id}/export",
+        "raw_path": f"/game/{game_id}/export".encode(),
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    status = 0
+    size = 0
+    first_chunk_s = None
+    started = time.perf_counter()
+    done = asyncio.Event()
+
+    async def receive():
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, size, first_chunk_s
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if body and first_chunk_s is None:
+                first_chunk_s = time.perf_counter() - started
+            size += len(body)
+            out.write(body)
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return status, size, first_chunk_s or 0.0
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=200)
+    parser.add_argument("--image-kb", type=int, default=2048, help="1 枚あたりの画像サイズ (KiB)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="zero")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--ceiling-mb", type=float, help="許容するピーク割り当て (MiB)")
+    args = parser.parse_args(argv)
+
+    backends = FakeBackends.create(make_profile(args.profile, latency_scale=args.latency_scale))
+    app = install_fakes(backends)
+    from app.config import EXPORT_CONCURRENCY
+
+    image_bytes = args.image_kb * 1024
+    game_id = seed_game(backends, args.photos, image_bytes)
+    ceiling = args.ceiling_mb or ((EXPORT_CONCURRENCY + 4) * image_bytes + 16 * MiB) / MiB
+
+    with tempfile.TemporaryFile() as out:
+        tracemalloc.start()
+        started = time.perf_counter()
+        status, size, first_chunk_s = asyncio.run(export(app, game_id, out))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        out.seek(0)
+        with zipfile.ZipFile(out) as zf:
+            names = zf.namelist()
+            bad = zf.testzip()
+
+    peak_mb = peak / MiB
+    print(f"status {status}, {size / MiB:.1f} MiB archive, {len(names)} entries, crc {'ok' if bad is None else 'BAD: ' + bad}")
+    print(f"{elapsed:.2f}s total, first chunk after {first_chunk_s * 1000:.0f} ms, {size / MiB / elapsed:.0f} MiB/s")
+    print(f"peak allocation {peak_mb:.1f} MiB (ceiling {ceiling:.1f} MiB, concurrency {EXPORT_CONCURRENCY})")
+
+    expected = 2 * args.photos + 1
+    if status != 200 or bad is not None or len(names) != expected or peak_mb > ceiling:
+        print("FAIL", file=sys.stderr)
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,832 @@
+"""In-memory stand-ins for Firestore, the GCS bucket and genai.Client.
+
+各フェイクは本物の SDK が公開している API のうち、app/ が使う範囲だけを実装する。
+Firestore / GCS クライアントは本物と同じく同期 (ブロッキング) 呼び出しなので
+レイテンシも time.sleep で再現し、Gemini は asyncio.sleep で再現する。
+"""
+
+import asyncio
+import copy
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from google.api_core import exceptions as gexc
+from google.cloud.firestore_v1 import transforms
+from google.genai import errors, types
+
+
+# --- Latency ---
+
+
+@dataclass
+class LatencyModel:
+    """対数正規分布のレイテンシ。median / p95 をミリ秒で指定する。"""
+
+    median_ms: float = 0.0
+    p95_ms: float = 0.0
+
+    def sample(self, rng: random.Random, scale: float = 1.0) -> float:
+        """1 回分のレイテンシを秒で返す。"""
+        if self.median_ms <= 0:
+            return 0.0
+        p95 = max(self.p95_ms, self.median_ms)
+        sigma = math.log(p95 / self.median_ms) / 1.645
+        return rng.lognormvariate(math.log(self.median_ms), sigma) * scale / 1000
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """'120' や '120:400' (median:p95) 形式の文字列を解析する。"""
+        median, _, p95 = spec.partition(":")
+        return cls(float(median), float(p95 or median))
+
+
+@dataclass
+class BackendProfile:
+    """フェイクバックエンド全体の挙動設定。"""
+
+    firestore_read: LatencyModel = field(default_factory=LatencyModel)
+    firestore_write: LatencyModel = field(default_factory=LatencyModel)
+    gcs_upload: LatencyModel = field(default_factory=LatencyModel)
+    gcs_download: LatencyModel = field(default_factory=LatencyModel)
+    gemini_default: LatencyModel = field(default_factory=LatencyModel)
+    gemini_upload: LatencyModel = field(default_factory=LatencyModel)
+    gemini_models: dict[str, LatencyModel] = field(default_factory=dict)
+    latency_scale: float = 1.0
+    rate_limit_rate: float = 0.0  # Gemini 呼び出しが 429 になる確率
+    detect_hit_rate: float = 0.6  # Vision 検出が残りアイテムを返す確率
+    malformed_text_rate: float = 0.0  # 統合ターン (検出 + 合成) の判定テキストが壊れる確率
+    image_size: int = 512  # 生成画像の一辺 (px)
+    seed: int = 0
+
+    def gemini_latency(self, model: str) -> LatencyModel:
+        return self.gemini_models.get(model, self.gemini_default)
+
+
+PROFILES: dict[str, dict[str, Any]] = {
+    "zero": {},
+    "realistic": {
+        "firestore_read": LatencyModel(12, 40),
+        "firestore_write": LatencyModel(20, 60),
+        "gcs_upload": LatencyModel(60, 200),
+        "gcs_download": LatencyModel(40, 150),
+        "gemini_default": LatencyModel(900, 2500),
+        "gemini_upload": LatencyModel(150, 400),
+        "gemini_models": {
+            "gemini-2.5-flash": LatencyModel(1200, 3000),
+            "gemini-3-pro-image-preview": LatencyModel(9000, 20000),
+            "gemini-2.0-flash-exp-image-generation": LatencyModel(4000, 9000),
+            "nano-banana-pro-preview": LatencyModel(8000, 18000),
+            "gemini-2.5-flash-image": LatencyModel(3000, 7000),
+        },
+    },
+}
+
+
+def make_profile(name: str, **overrides: Any) -> BackendProfile:
+    params = dict(PROFILES[name])
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    return BackendProfile(**params)
+
+
+class _Clock:
+    """プロファイルと乱数源を共有するための小さなヘルパー。"""
+
+    def __init__(self, profile: BackendProfile):
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self._lock = threading.Lock()
+
+    def delay(self, model: LatencyModel) -> float:
+        with self._lock:
+            return model.sample(self.rng, self.profile.latency_scale)
+
+    def chance(self, p: float) -> bool:
+        if p <= 0:
+            return False
+        with self._lock:
+            return self.rng.random() < p
+
+    def sleep(self, model: LatencyModel) -> None:
+        d = self.delay(model)
+        if d > 0:
+            time.sleep(d)
+
+    async def asleep(self, model: LatencyModel) -> None:
+        d = self.delay(model)
+        if d > 0:
+            await asyncio.sleep(d)
+
+
+def make_png(size: int, seed: int = 0) -> bytes:
+    """size x size のノイズ入り RGB PNG を標準ライブラリだけで生成する。"""
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(size * 3) for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+# --- Firestore ---
+
+
+def _apply_update(data: dict, updates: dict) -> None:
+    for key, value in updates.items():
+        if value is transforms.DELETE_FIELD:
+            data.pop(key, None)
+        elif value is transforms.SERVER_TIMESTAMP:
+            data[key] = datetime.now(timezone.utc)
+        elif isinstance(value, transforms.ArrayUnion):
+            current = list(data.get(key) or [])
+            current.extend(v for v in value.values if v not in current)
+            data[key] = current
+        elif isinstance(value, transforms.ArrayRemove):
+            data[key] = [v for v in data.get(key) or [] if v not in value.values]
+        elif isinstance(value, transforms.Increment):
+            data[key] = (data.get(key) or 0) + value.value
+        else:
+            data[key] = copy.deepcopy(value)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: dict | None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self._data)
+
+    def get(self, field_path: str) -> Any:
+        return (self._data or {}).get(field_path)
+
+
+class FakeDocumentReference:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._db, f"{self.path}/{name}")
+
+    def get(self, **_: Any) -> FakeDocumentSnapshot:
+        self._db._read()
+        return FakeDocumentSnapshot(self, copy.deepcopy(self._db._docs.get(self.path)))
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        self._db._write()
+        self._db._set(self.path, data, merge)
+
+    def update(self, data: dict) -> None:
+        self._db._write()
+        self._db._update(self.path, data)
+
+    def delete(self) -> None:
+        self._db._write()
+        self._db._delete(self.path)
+
+
+class FakeQuery:
+    def __init__(self, db: "FakeFirestore", path: str):
+        self._db = db
+        self._path = path
+        self._filters: list[tuple[str, str, Any]] = []
+        self._orders: list[tuple[str, bool]] = []
+        self._limit: int | None = None
+        self._start_after: dict | None = None
+
+    def _clone(self) -> "FakeQuery":
+        q = FakeQuery(self._db, self._path)
+        q._filters = list(self._filters)
+        q._orders = list(self._orders)
+        q._limit = self._limit
+        q._start_after = self._start_after
+        return q
+
+    def where(self, field_path: str | None = None, op_string: str | None = None, value: Any = None, *, filter: Any = None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if field_path == "__name__" and isinstance(value, FakeDocumentReference):
+            value = value.id
+        q = self._clone()
+        q._filters.append((field_path, op_string, value))
+        return q
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        q = self._clone()
+        q._orders.append((field_path, direction == "DESCENDING"))
+        return q
+
+    def limit(self, count: int) -> "FakeQuery":
+        q = self._clone()
+        q._limit = count
+        return q
+
+    def start_after(self, document_fields_or_snapshot: Any) -> "FakeQuery":
+        q = self._clone()
+        cursor = document_fields_or_snapshot
+        if isinstance(cursor, FakeDocumentSnapshot):
+            cursor = {**(cursor._data or {}), "__name__": cursor.id}
+        elif isinstance(cursor.get("__name__"), FakeDocumentReference):
+            cursor = {**cursor, "__name__": cursor["__name__"].id}
+        q._start_after = cursor
+        return q
+
+    def _matches(self, doc_id: str, data: dict) -> bool:
+        for field_path, op, value in self._filters:
+            actual = doc_id if field_path == "__name__" else data.get(field_path)
+            if op == "==" and actual != value:
+                return False
+            if op == "!=" and actual == value:
+                return False
+            if op == "in" and actual not in value:
+                return False
+            if op == "not-in" and actual in value:
+                return False
+            if op == "array_contains" and value not in (actual or []):
+                return False
+            if op in ("<", "<=", ">", ">=") and (actual is None or not _compare(actual, op, value)):
+                return False
+        return True
+
+    def _results(self) -> list[tuple[str, str, dict]]:
+        prefix = self._path + "/"
+        rows = [
+            (path[len(prefix):], path, data)
+            for path, data in list(self._db._docs.items())
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        ]
+        rows = [r for r in rows if self._matches(r[0], r[2])]
+        for field_path, descending in reversed(self._orders or [("__name__", False)]):
+            rows.sort(
+                key=lambda r, f=field_path: r[0] if f == "__name__" else (r[2].get(f) is None, r[2].get(f)),
+                reverse=descending,
+            )
+        if self._start_after is not None:
+            orders = self._orders or [("__name__", False)]
+            cursor = tuple(self._start_after.get(f) for f, _ in orders)
+            descending = orders[0][1]
+
+            def after(r: tuple[str, str, dict]) -> bool:
+                key = tuple(r[0] if f == "__name__" else r[2].get(f) for f, _ in orders)
+                return key < cursor if descending else key > cursor
+
+            rows = [r for r in rows if after(r)]
+        if self._limit is not None:
+            rows = rows[: self._limit]
+        return rows
+
+    def stream(self, **_: Any):
+        self._db._read()
+        for doc_id, path, data in self._results():
+            yield FakeDocumentSnapshot(FakeDocumentReference(self._db, path), copy.deepcopy(data))
+
+    def get(self, **kwargs: Any) -> list[FakeDocumentSnapshot]:
+        return list(self.stream(**kwargs))
+
+    def on_snapshot(self, callback: Any) -> "FakeWatch":
+        return FakeWatch(self._db, self, callback)
+
+
+class _FakeChangeType:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _FakeDocumentChange:
+    def __init__(self, type_name: str, document: FakeDocumentSnapshot):
+        self.type = _FakeChangeType(type_name)
+        self.document = document
+
+
+class FakeWatch:
+    """クエリのスナップショットリスナー。追加されたドキュメント (ADDED) だけを通知する。
+
+    本物はリスナースレッドから呼ぶが、フェイクは書き込んだスレッドで同期的に呼ぶ。
+    """
+
+    def __init__(self, db: "FakeFirestore", query: FakeQuery, callback: Any):
+        self._db = db
+        self._query = query
+        self._callback = callback
+        self._seen: set[str] = set()
+        self.path = query._path
+        with db._lock:
+            db._watches.append(self)
+            self._deliver(initial=True)
+
+    def _deliver(self, initial: bool = False) -> None:
+        docs = [
+            FakeDocumentSnapshot(FakeDocumentReference(self._db, path), copy.deepcopy(data))
+            for _, path, data in self._query._results()
+        ]
+        added = [d for d in docs if d.id not in self._seen]
+        if not added and not initial:
+            return
+        self._seen.update(d.id for d in added)
+        self._db.reads += max(1, len(added))
+        self._callback(docs, [_FakeDocumentChange("ADDED", d) for d in added], datetime.now(timezone.utc))
+
+    def unsubscribe(self) -> None:
+        with self._db._lock:
+            if self in self._db._watches:
+                self._db._watches.remove(self)
+
+
+def _compare(actual: Any, op: str, value: Any) -> bool:
+    if op == "<":
+        return actual < value
+    if op == "<=":
+        return actual <= value
+    if op == ">":
+        return actual > value
+    return actual >= value
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db: "FakeFirestore", path: str):
+        super().__init__(db, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str | None = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._db, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def list_documents(self) -> list[FakeDocumentReference]:
+        return [FakeDocumentReference(self._db, path) for _, path, _ in FakeQuery(self._db, self._path)._results()]
+
+
+class FakeWriteBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self._db = db
+        self._ops: list[tuple[str, str, Any, bool]] = []
+
+    def set(self, reference: FakeDocumentReference, data: dict, merge: bool = False) -> None:
+        self._ops.append(("set", reference.path, data, merge))
+
+    def update(self, reference: FakeDocumentReference, data: dict) -> None:
+        self._ops.append(("update", reference.path, data, False))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._ops.append(("delete", reference.path, None, False))
+
+    def commit(self) -> list:
+        self._db._write()
+        with self._db._lock:
+            existing = set(self._db._docs)
+            for op, path, data, merge in self._ops:
+                if op == "update" and path not in existing:
+                    raise gexc.NotFound(f"No document to update: {path}")
+                if op == "set":
+                    existing.add(path)
+                elif op == "delete":
+                    existing.discard(path)
+            for op, path, data, merge in self._ops:
+                if op == "set":
+                    self._db._set(path, data, merge)
+                elif op == "update":
+                    self._db._update(path, data)
+                else:
+                    self._db._delete(path)
+        ops, self._ops = self._ops, []
+        return ops
+
+
+class FakeFirestore:
+    """firestore.Client の最小限のインメモリ実装。"""
+
+    def __init__(self, clock: _Clock):
+        self._clock = clock
+        self._docs: dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self._watches: list[FakeWatch] = []
+        self.reads = 0
+        self.writes = 0
+
+    def _read(self) -> None:
+        self.reads += 1
+        self._clock.sleep(self._clock.profile.firestore_read)
+
+    def _write(self) -> None:
+        self.writes += 1
+        self._clock.sleep(self._clock.profile.firestore_write)
+
+    def _set(self, path: str, data: dict, merge: bool) -> None:
+        with self._lock:
+            base = dict(self._docs.get(path) or {}) if merge else {}
+            _apply_update(base, data)
+            self._docs[path] = base
+            self._notify(path)
+
+    def _notify(self, path: str) -> None:
+        parent = path.rsplit("/", 1)[0]
+        for watch in list(self._watches):
+            if watch.path == parent:
+                watch._deliver()
+
+    def _update(self, path: str, data: dict) -> None:
+        with self._lock:
+            if path not in self._docs:
+                raise gexc.NotFound(f"No document to update: {path}")
+            _apply_update(self._docs[path], data)
+
+    def _delete(self, path: str) -> None:
+        with self._lock:
+            self._docs.pop(path, None)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def document(self, path: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, path)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+
+# --- Cloud Storage ---
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def public_url(self) -> str:
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    @property
+    def _entry(self) -> dict | None:
+        return self.bucket._objects.get(self.name)
+
+    @property
+    def size(self) -> int | None:
+        entry = self._entry
+        return len(entry["data"]) if entry else None
+
+    @property
+    def content_type(self) -> str | None:
+        entry = self._entry
+        return entry["content_type"] if entry else None
+
+    @property
+    def updated(self) -> datetime | None:
+        entry = self._entry
+        return entry["updated"] if entry else None
+
+    def upload_from_string(self, data: bytes | str, content_type: str | None = None) -> None:
+        if isinstance(data, str):
+            data = data.encode()
+        self.bucket._clock.sleep(self.bucket._clock.profile.gcs_upload)
+        self.bucket.bytes_uploaded += len(data)
+        self.bucket._objects[self.name] = {
+            "data": bytes(data),
+            "content_type": content_type,
+            "updated": datetime.now(timezone.utc),
+        }
+
+    def upload_from_file(self, file_obj: Any, content_type: str | None = None) -> None:
+        self.upload_from_string(file_obj.read(), content_type=content_type)
+
+    def download_as_bytes(self) -> bytes:
+        self.bucket._clock.sleep(self.bucket._clock.profile.gcs_download)
+        entry = self._entry
+        if entry is None:
+            raise gexc.NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        self.bucket.bytes_downloaded += len(entry["data"])
+        # 実際のダウンロードと同じく呼び出しごとに新しいバッファを返す (メモリ計測のため)
+        return bytes(memoryview(entry["data"]))
+
+    def exists(self) -> bool:
+        return self.name in self.bucket._objects
+
+    def make_public(self) -> None:
+        # 本物は ACL を更新する別リクエスト
+        self.bucket._clock.sleep(self.bucket._clock.profile.gcs_upload)
+
+    def delete(self) -> None:
+        batch = self.bucket._batch
+        if batch is None:
+            self.bucket._clock.sleep(self.bucket._clock.profile.gcs_upload)
+            self.bucket.delete_requests += 1
+        if self.bucket._objects.pop(self.name, None) is None and (batch is None or batch.raise_exception):
+            raise gexc.NotFound(f"No such object: {self.bucket.name}/{self.name}")
+
+    def generate_signed_url(self, expiration: Any = None, **_: Any) -> str:
+        return f"{self.public_url}?X-Goog-Signature=fake"
+
+
+class _FakeStorageBatch:
+    """storage.Client.batch() の代替。中の delete を 1 リクエスト分のレイテンシでまとめて行う。"""
+
+    def __init__(self, bucket: "FakeBucket", raise_exception: bool):
+        self._bucket = bucket
+        self.raise_exception = raise_exception
+
+    def __enter__(self) -> "_FakeStorageBatch":
+        self._bucket._batch = self
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._bucket._batch = None
+        self._bucket._clock.sleep(self._bucket._clock.profile.gcs_upload)
+        self._bucket.delete_requests += 1
+
+
+class _FakeStorageClient:
+    def __init__(self, bucket: "FakeBucket"):
+        self._bucket = bucket
+
+    def batch(self, raise_exception: bool = True) -> _FakeStorageBatch:
+        return _FakeStorageBatch(self._bucket, raise_exception)
+
+
+class FakeBucket:
+    """storage.Bucket の最小限のインメモリ実装。"""
+
+    def __init__(self, clock: _Clock, name: str = "bench-bucket"):
+        self._clock = clock
+        self.name = name
+        self._objects: dict[str, dict] = {}
+        self._batch: _FakeStorageBatch | None = None
+        self.client = _FakeStorageClient(self)
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+        self.delete_requests = 0
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def get_blob(self, name: str) -> FakeBlob | None:
+        return FakeBlob(self, name) if name in self._objects else None
+
+    def list_blobs(self, prefix: str | None = None, **_: Any):
+        return [FakeBlob(self, n) for n in sorted(self._objects) if n.startswith(prefix or "")]
+
+    def delete_blobs(self, blobs: list, on_error: Any = None) -> None:
+        for blob in blobs:
+            name = blob if isinstance(blob, str) else blob.name
+            self._objects.pop(name, None)
+
+
+# --- Gemini ---
+
+
+_ITEM_RE = re.compile(r"([a-z_]+)\(")
+
+
+def _prompt_text(contents: Any) -> str:
+    if isinstance(contents, str):
+        return contents
+    texts: list[str] = []
+    for part in contents if isinstance(contents, list) else [contents]:
+        if isinstance(part, str):
+            texts.append(part)
+        elif getattr(part, "text", None):
+            texts.append(part.text)
+    return "\n".join(texts)
+
+
+def _inline_bytes(contents: Any) -> int:
+    if not isinstance(contents, list):
+        return 0
+    return sum(
+        len(part.inline_data.data)
+        for part in contents
+        if getattr(part, "inline_data", None) and part.inline_data.data
+    )
+
+
+def _text_response(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+    )
+
+
+class _FakeModels:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    async def generate_content(self, *, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        owner = self._owner
+        owner.calls[model] = owner.calls.get(model, 0) + 1
+        owner.bytes_inline += _inline_bytes(contents)
+        await owner._clock.asleep(owner._clock.profile.gemini_latency(model))
+        owner._maybe_rate_limit()
+        return owner._respond(model, contents, config)
+
+    async def generate_content_stream(self, *, model: str, contents: Any, config: Any = None):
+        owner = self._owner
+        owner.calls[model] = owner.calls.get(model, 0) + 1
+        owner.bytes_inline += _inline_bytes(contents)
+        # 最初のチャンクまでに全体の 1/4、残りをチャンク間に均等に割り振る
+        latency = owner._clock.profile.gemini_latency(model)
+        total = owner._clock.delay(latency)
+        owner._maybe_rate_limit()
+        text = owner._respond(model, contents, config).text or ""
+        chunks = [text[i : i + 8] for i in range(0, len(text), 8)] or [""]
+
+        async def stream():
+            await asyncio.sleep(total / 4)
+            for chunk in chunks:
+                owner.stream_chunks += 1
+                yield _text_response(chunk)
+                await asyncio.sleep(total * 3 / 4 / len(chunks))
+
+        return stream()
+
+
+class _FakeFiles:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    async def upload(self, *, file: Any, config: Any = None) -> types.File:
+        owner = self._owner
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        await owner._clock.asleep(owner._clock.profile.gemini_upload)
+        owner.bytes_uploaded += len(data)
+        name = f"files/{uuid.uuid4().hex[:12]}"
+        now = datetime.now(timezone.utc)
+        return types.File(
+            name=name,
+            uri=f"https://generativelanguage.googleapis.com/v1beta/{name}",
+            mime_type=getattr(config, "mime_type", None),
+            size_bytes=len(data),
+            create_time=now,
+            expiration_time=now + timedelta(hours=48),
+            state="ACTIVE",
+        )
+
+
+class _FakeLiveSession:
+    """Live API セッションの代替。「判定」ターンに直近の残りアイテムから判定 JSON を返す。"""
+
+    def __init__(self, owner: "FakeGenaiClient", model: str, instruction: str):
+        self._owner = owner
+        self._model = model
+        self._context = instruction
+        self._responses: asyncio.Queue[types.LiveServerMessage] = asyncio.Queue()
+        self.frames = 0
+
+    async def send_realtime_input(self, *, video: Any = None, **_: Any) -> None:
+        self.frames += 1
+        self._owner.bytes_inline += len(getattr(video, "data", b"") or b"")
+
+    async def send_client_content(self, *, turns: Any = None, turn_complete: bool = True) -> None:
+        text = _prompt_text(getattr(turns, "parts", None) or turns or [])
+        if "残りアイテム:" in text:
+            self._context = text
+        if turn_complete:
+            asyncio.get_running_loop().create_task(self._reply())
+
+    async def _reply(self) -> None:
+        owner = self._owner
+        owner.calls[self._model] = owner.calls.get(self._model, 0) + 1
+        await owner._clock.asleep(owner._clock.profile.gemini_latency(self._model))
+        await self._responses.put(
+            types.LiveServerMessage(
+                server_content=types.LiveServerContent(
+                    model_turn=types.Content(role="model", parts=[types.Part(text=owner._detection(self._context))]),
+                    turn_complete=True,
+                )
+            )
+        )
+
+    async def receive(self):
+        while True:
+            message = await self._responses.get()
+            yield message
+            if message.server_content and message.server_content.turn_complete:
+                return
+
+
+class _FakeLive:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+        self.sessions: list[_FakeLiveSession] = []
+
+    @asynccontextmanager
+    async def connect(self, *, model: str, config: Any = None):
+        instruction = getattr(config, "system_instruction", None) or ""
+        session = _FakeLiveSession(self._owner, model, _prompt_text(instruction))
+        self.sessions.append(session)
+        yield session
+
+
+class _FakeAio:
+    def __init__(self, owner: "FakeGenaiClient"):
+        self.models = _FakeModels(owner)
+        self.files = _FakeFiles(owner)
+        self.live = _FakeLive(owner)
+
+
+class FakeGenaiClient:
+    """genai.Client の最小限の代替。レイテンシと 429 をプロファイルに従って注入する。"""
+
+    def __init__(self, clock: _Clock, **_: Any):
+        self._clock = clock
+        self.calls: dict[str, int] = {}
+        self.rate_limited = 0
+        self.bytes_inline = 0
+        self.bytes_uploaded = 0
+        self.stream_chunks = 0
+        self.aio = _FakeAio(self)
+        self._image_cache: dict[int, bytes] = {}
+
+    def _maybe_rate_limit(self) -> None:
+        if self._clock.chance(self._clock.profile.rate_limit_rate):
+            self.rate_limited += 1
+            raise errors.ClientError(
+                429,
+                {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}},
+            )
+
+    def image(self) -> bytes:
+        size = self._clock.profile.image_size
+        if size not in self._image_cache:
+            self._image_cache[size] = make_png(size, seed=self._clock.profile.seed)
+        return self._image_cache[size]
+
+    def _detection(self, prompt: str) -> str:
+        remaining = _ITEM_RE.findall(prompt.split("残りアイテム:", 1)[-1].split("\n", 1)[0])
+        if remaining and self._clock.chance(self._clock.profile.detect_hit_rate):
+            with self._clock._lock:
+                item = self._clock.rng.choice(remaining)
+            return json.dumps({"detected_item": item, "confidence": "high", "explanation": "bench"})
+        return json.dumps({"detected_item": None, "confidence": "none", "explanation": "bench"})
+
+    def _respond(self, model: str, contents: Any, config: Any) -> types.GenerateContentResponse:
+        schema = getattr(config, "response_schema", None)
+        schema_name = getattr(schema, "__name__", "")
+        prompt = _prompt_text(contents)
+
+        if schema_name == "VisionDetectionResult":
+            return _text_response(self._detection(prompt))
+
+        if schema_name == "BurstDetectionResult":
+            match = re.search(r"フレーム数: (\d+)", prompt)
+            frames = [
+                {"frame_index": i, **json.loads(self._detection(prompt))} for i in range(int(match.group(1)) if match else 1)
+            ]
+            return _text_response(json.dumps({"frames": frames}))
+
+        if schema_name == "AccusationJudgment":
+            return _text_response(json.dumps({"correct": True, "explanation": "お見事です！"}))
+
+        modalities = getattr(config, "response_modalities", None) or []
+        if "IMAGE" in modalities:
+            parts = [
+                types.Part(text="幽霊が静かに佇んでいる。"),
+                types.Part(inline_data=types.Blob(data=self.image(), mime_type="image/png")),
+            ]
+            if "残りアイテム:" in prompt:
+                # 統合ターン: 判定 JSON を先頭のテキストとして返す
+                if self._clock.chance(self._clock.profile.malformed_text_rate):
+                    parts.insert(0, types.Part(text="判定: たぶんコップです"))
+                else:
+                    parts.insert(0, types.Part(text=f"```json\n{self._detection(prompt)}\n```"))
+            return types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=parts))]
+            )
+
+        return _text_response(f"bench response to {len(prompt)} chars")
+
+
+# --- Wiring ---
+
+
+@dataclass
+class FakeBackends:
+    profile: BackendProfile
+    db: FakeFirestore
+    bucket: FakeBucket
+    genai: FakeGenaiClient
+
+    @classmethod
+    def create(cls, profile: BackendProfile) -> "FakeBackends":
+        clock = _Clock(profile)
+        return cls(profile, FakeFirestore(clock), FakeBucket(clock), FakeGenaiClient(clock))
@@ -0,0 +1,175 @@
+"""Wire the fake backends into the real app and collect request metrics."""
+
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import types as pytypes
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import httpx
+
+from bench.fakes import FakeBackends
+
+
+def install_fakes(backends: FakeBackends):
+    """firebase_admin と genai.Client をフェイクに差し替えてから app を import する。
+
+    scripts/generate_openapi.py と同じく sys.modules を差し替えるが、
+    MagicMock ではなく実際に動作するインメモリ実装を返す。
+    """
+    if "app.main" in sys.modules:
+        raise RuntimeError("app.main is already imported; install_fakes must run first")
+
+    firebase_admin = pytypes.ModuleType("firebase_admin")
+    credentials = pytypes.ModuleType("firebase_admin.credentials")
+    firestore = pytypes.ModuleType("firebase_admin.firestore")
+    storage = pytypes.ModuleType("firebase_admin.storage")
+
+    credentials.Certificate = lambda *_args, **_kwargs: None
+    firestore.client = lambda *_args, **_kwargs: backends.db
+    storage.bucket = lambda *_args, **_kwargs: backends.bucket
+    firebase_admin.initialize_app = lambda *_args, **_kwargs: None
+    firebase_admin.credentials = credentials
+    firebase_admin.firestore = firestore
+    firebase_admin.storage = storage
+
+    sys.modules["firebase_admin"] = firebase_admin
+    sys.modules["firebase_admin.credentials"] = credentials
+    sys.modules["firebase_admin.firestore"] = firestore
+    sys.modules["firebase_admin.storage"] = storage
+
+    from google import genai
+
+    genai.Client = lambda *_args, **_kwargs: backends.genai
+
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    os.environ.setdefault("FIREBASE_STORAGE_BUCKET", backends.bucket.name)
+    os.environ.pop("FIREBASE_SERVICE_ACCOUNT_KEY", None)
+
+    from app.main import app
+
+    return app
+
+
+def peak_rss_mb() -> float:
+    """このプロセスのピーク RSS (MiB)。Linux の ru_maxrss は KiB 単位。"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 if sys.platform != "darwin" else rss / 1024 / 1024
+
+
+def children_peak_rss_mb() -> float | None:
+    """動作中の子プロセス (画像エンコード用のプール) のピーク RSS の合計 (MiB)。
+
+    /proc の VmHWM を読むので Linux 以外では None。
+    """
+    total_kib = 0
+    for child in multiprocessing.active_children():
+        try:
+            with open(f"/proc/{child.pid}/status") as f:
+                total_kib += next(
+                    int(line.split()[1]) for line in f if line.startswith("VmHWM:")
+                )
+        except (OSError, StopIteration):
+            return None
+    return total_kib / 1024
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+@dataclass
+class Recorder:
+    """エンドポイントごとのレイテンシとステータスを集計する。"""
+
+    durations: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: dict[str, dict[int, int]] = field(default_factory=lambda: defaultdict(lambda: defaultdict(int)))
+    started: float = field(default_factory=time.perf_counter)
+    # プールは bench_client の終了時に止まるので、その直前に測って入れておく
+    children_peak_rss_mb: float | None = None
+
+    def add(self, label: str, status: int, seconds: float) -> None:
+        self.durations[label].append(seconds)
+        self.statuses[label][status] += 1
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        total = sum(len(v) for v in self.durations.values())
+        endpoints = {}
+        for label, values in sorted(self.durations.items()):
+            values = sorted(values)
+            endpoints[label] = {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "max_ms": values[-1] * 1000,
+                "statuses": dict(sorted(self.statuses[label].items())),
+            }
+        return {
+            "elapsed_s": elapsed,
+            "requests": total,
+            "throughput_rps": total / elapsed if elapsed > 0 else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": self.children_peak_rss_mb,
+            "endpoints": endpoints,
+        }
+
+
+def format_summary(summary: dict) -> str:
+    children = summary.get("children_peak_rss_mb")
+    children_rss = (
+        f" (+{children:.1f} MiB in worker processes)"
+        if children is not None
+        else " (worker processes not included)"
+    )
+    lines = [
+        f"requests={summary['requests']} elapsed={summary['elapsed_s']:.2f}s "
+        f"throughput={summary['throughput_rps']:.1f} req/s "
+        f"peak_rss={summary['peak_rss_mb']:.1f} MiB{children_rss}",
+        "",
+        f"{'endpoint':<40} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  statuses",
+    ]
+    for label, s in summary["endpoints"].items():
+        statuses = " ".join(f"{k}:{v}" for k, v in s["statuses"].items())
+        lines.append(
+            f"{label:<40} {s['count']:>5} {s['p50_ms']:>8.1f}ms {s['p95_ms']:>8.1f}ms "
+            f"{s['p99_ms']:>8.1f}ms {s['max_ms']:>8.1f}ms  {statuses}"
+        )
+    return "\n".join(lines)
+
+
+class BenchClient:
+    """httpx.AsyncClient をラップし、リクエストごとにラベル付きで計測する。"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder):
+        self._client = client
+        self.recorder = recorder
+
+    async def request(self, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self._client.request(method, url, **kwargs)
+        self.recorder.add(label, response.status_code, time.perf_counter() - start)
+        return response
+
+
+@asynccontextmanager
+async def bench_client(app, recorder: Recorder):
+    """app の lifespan (プールの起動・停止) を実行しながらクライアントを返す。
+
+    ASGITransport は lifespan を送らないので、ここで直接実行する。
+    """
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        # プールの起動時間はスループットに含めない
+        recorder.started = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            yield BenchClient(client, recorder)
+        recorder.children_peak_rss_mb = children_peak_rss_mb()
@@ -0,0 +1,258 @@
+"""Replay a recorded production trace (TRACE_RECORD_PATH) against the real app.
+
+    uv run python -m bench.replay trace.jsonl --speed 4 --json replay.json
+    uv run python -m bench.replay trace.jsonl --speed 4 --baseline replay.json
+
+トレースに記録された Gemini / Firestore / GCS 呼び出しの所要時間からフェイクバックエンドの
+レイテンシ分布 (種別・モデルごとの median / p95) を作り、記録と同じ到着間隔 (--speed 倍速) で
+同じルートにリクエストを送る。ゲームはトレース上のゲームキーごとに 1 つ作って使い回す。
+リクエスト本文は記録していないので、ルートごとに同じ大きさ・枚数の合成データを送る。
+記録で If-None-Match 付きだったリクエストは、同じパスで前回受け取った ETag を付けて送る。
+WebSocket セッションと本文を合成できないルートは再生せず、件数だけ表示する。
+
+結果は記録時の所要時間と並べて表示する。--baseline に以前の --json 出力を渡すと、
+p50 か p95 が --tolerance (かつ --min-delta-ms) を超えて悪化したエンドポイントがあれば
+終了コード 1 を返す。レイテンシは分布からの抽選なので、比較にはリクエスト数の多いトレースを使う。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from bench.fakes import FakeBackends, LatencyModel, make_png, make_profile
+from bench.harness import BenchClient, Recorder, bench_client, format_summary, install_fakes, percentile
+
+# 本文を合成できるルート (method, route) → 本文の種類
+BODIES = {
+    ("POST", "/game/"): {"json": {"player_name": "replay"}},
+    ("PATCH", "/game/{game_id}"): {"json": {"status": "playing"}},
+    ("POST", "/game/{game_id}/accuse"): {"json": {"suspect_name": "replay", "reason": "replay"}},
+    ("POST", "/gemini/generate"): {"json": {"prompt": "replay"}},
+    ("POST", "/gemini/generate/stream"): {"json": {"prompt": "replay"}},
+    ("POST", "/gemini/generate-image"): {"json": {"prompt": "replay"}},
+    ("POST", "/game/{game_id}/turn"): {"files": "file"},
+    ("POST", "/game/{game_id}/turn/burst"): {"files": "files"},
+    ("POST", "/game/{game_id}/photos/"): {"files": "file"},
+    ("POST", "/storage/upload"): {"files": "file"},
+}
+
+# {game_id} と {photo_id} 以外のパスパラメータの値
+PATH_DEFAULTS = {"item": "cup"}
+
+
+def load_trace(paths: list[Path]) -> list[dict]:
+    records = []
+    for path in paths:
+        with path.open() as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda r: r["t"])
+    return records
+
+
+def _fit(samples_ms: list[float]) -> LatencyModel:
+    samples = sorted(samples_ms)
+    return LatencyModel(percentile(samples, 0.50), percentile(samples, 0.95))
+
+
+def profile_from_trace(records: list[dict], **overrides) -> dict:
+    """記録された呼び出し時間から make_profile に渡すレイテンシ設定を作る。"""
+    durations: dict[str, list[float]] = defaultdict(list)
+    for record in records:
+        for kind, _start, duration, _ok in record.get("calls", []):
+            durations[kind].append(duration)
+
+    params: dict = {"gemini_models": {}}
+    gemini_all = []
+    for kind, samples in durations.items():
+        if kind.startswith("gemini:"):
+            params["gemini_models"][kind.split(":", 1)[1]] = _fit(samples)
+            gemini_all.extend(samples)
+        elif kind in ("firestore_read", "firestore_write", "gcs_upload", "gcs_download", "gemini_upload"):
+            params[kind] = _fit(samples)
+    if gemini_all:
+        params["gemini_default"] = _fit(gemini_all)
+    params.update(overrides)
+    return params
+
+
+def _label(record: dict) -> str:
+    return f"{record['method']} {record['route']}"
+
+
+class Replayer:
+    def __init__(self, client: BenchClient, photo_cache: dict[int, bytes]):
+        self.client = client
+        self.photo_cache = photo_cache
+        self.games: dict[str, asyncio.Task] = {}
+        self.photos: dict[str, list[str]] = defaultdict(list)
+        # パスごとに最後に受け取った ETag (条件付きリクエストで送り返す)
+        self.etags: dict[str, str] = {}
+        self.skipped: dict[str, int] = defaultdict(int)
+
+    def _photo(self, size_bytes: int) -> bytes:
+        # ノイズ PNG はほぼ無圧縮 (1 px = 3 byte) なので、記録と同程度の大きさになる一辺を選ぶ
+        side = max(16, min(2048, int(math.sqrt(max(size_bytes, 1) / 3))))
+        side -= side % 16
+        if side not in self.photo_cache:
+            self.photo_cache[side] = make_png(side, seed=side)
+        return self.photo_cache[side]
+
+    async def _create_game(self) -> str:
+        response = await self.client.request("(setup) POST /game/", "POST", "/game/", json={"player_name": "replay"})
+        return response.json()["id"]
+
+    async def game_id(self, key: str) -> str:
+        # 記録に現れたゲームキーごとに 1 度だけ作る
+        if key not in self.games:
+            self.games[key] = asyncio.create_task(self._create_game())
+        return await self.games[key]
+
+    async def _path(self, record: dict) -> str | None:
+        path = record["route"]
+        if "{game_id}" in path:
+            if "game" not in record:
+                return None
+            game_key = record["game"]
+            path = path.replace("{game_id}", await self.game_id(game_key))
+            if "{photo_id}" in path:
+                if not self.photos[game_key]:
+                    return None
+                path = path.replace("{photo_id}", self.photos[game_key][-1])
+        for name, value in PATH_DEFAULTS.items():
+            path = path.replace("{" + name + "}", value)
+        return None if "{" in path else path
+
+    async def send(self, record: dict) -> None:
+        label = _label(record)
+        if record["kind"] != "http":
+            self.skipped[label] += 1
+            return
+        path = await self._path(record)
+        body = BODIES.get((record["method"], record["route"]), {})
+        if path is None or (record.get("req_bytes") and not body):
+            self.skipped[label] += 1
+            return
+
+        kwargs = {}
+        if record.get("conditional") and path in self.etags:
+            kwargs["headers"] = {"If-None-Match": self.etags[path]}
+        if "json" in body:
+            kwargs["json"] = body["json"]
+        elif "files" in body:
+            count = max(1, record.get("files", 1))
+            photo = self._photo(record.get("req_bytes", 0) // count)
+            kwargs["files"] = [(body["files"], (f"replay{i}.png", photo, "image/png")) for i in range(count)]
+
+        response = await self.client.request(label, record["method"], path, **kwargs)
+        if "etag" in response.headers:
+            self.etags[path] = response.headers["etag"]
+        # 以降の /photos/{photo_id} で使えるよう、作られた写真を覚えておく
+        if response.status_code == 200 and record["method"] == "POST":
+            if record["route"].endswith(("/turn", "/turn/burst")):
+                self.photos[record["game"]].append(response.json()["photo_id"])
+            elif record["route"] == "/game/{game_id}/photos/":
+                self.photos[record["game"]].append(response.json()["id"])
+
+
+def recorded_summary(records: list[dict]) -> dict[str, dict]:
+    durations: dict[str, list[float]] = defaultdict(list)
+    for record in records:
+        if record.get("route"):
+            durations[_label(record)].append(record["dur_ms"])
+    return {
+        label: {"count": len(v), "p50_ms": percentile(sorted(v), 0.50), "p95_ms": percentile(sorted(v), 0.95)}
+        for label, v in durations.items()
+    }
+
+
+async def replay(args: argparse.Namespace, records: list[dict]) -> dict:
+    params = profile_from_trace(records, latency_scale=args.latency_scale, seed=args.seed)
+    backends = FakeBackends.create(make_profile("zero", **params))
+    app = install_fakes(backends)
+
+    recorder = Recorder()
+    t0 = records[0]["t"]
+    async with bench_client(app, recorder) as client:
+        replayer = Replayer(client, {})
+        started = time.perf_counter()
+
+        async def fire(record: dict) -> None:
+            delay = (record["t"] - t0) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await replayer.send(record)
+
+        await asyncio.gather(*(fire(r) for r in records if r.get("route")))
+
+    summary = recorder.summary()
+    summary["skipped"] = dict(replayer.skipped)
+    summary["recorded"] = recorded_summary(records)
+    summary["profile"] = {
+        k: (v.__dict__ if isinstance(v, LatencyModel) else {m: lm.__dict__ for m, lm in v.items()})
+        for k, v in params.items()
+        if k not in ("latency_scale", "seed")
+    }
+    return summary
+
+
+def compare(summary: dict, baseline: dict, tolerance: float, min_delta_ms: float, min_count: int) -> list[str]:
+    """p50 / p95 が割合でも絶対値でも悪化したエンドポイントを返す (件数の少ないものは比較しない)。"""
+    regressions = []
+    for label, current in summary["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(label)
+        if not before or min(current["count"], before["count"]) < min_count:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            delta = current[key] - before[key]
+            if delta > min_delta_ms and delta > before[key] * tolerance:
+                regressions.append(f"{label}: {key[:3]} {before[key]:.1f}ms -> {current[key]:.1f}ms")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", type=Path, nargs="+", help="TRACE_RECORD_PATH で記録した JSONL")
+    parser.add_argument("--speed", type=float, default=1.0, help="到着間隔を何倍速で再生するか")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="再現するレイテンシに掛ける係数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="結果を JSON で保存するパス")
+    parser.add_argument("--baseline", type=Path, help="比較する以前の --json 出力")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="許容する p50 / p95 の悪化率")
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="これ以下の悪化は無視する (ms)")
+    parser.add_argument("--min-count", type=int, default=20, help="比較に必要なリクエスト数")
+    parser.add_argument("--verbose", action="store_true", help="app のログ (例外トレース) を表示")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    records = load_trace(args.trace)
+    if not records:
+        sys.exit("trace is empty")
+    summary = asyncio.run(replay(args, records))
+
+    print(format_summary(summary))
+    print()
+    print(f"{'recorded':<40} {'n':>5} {'p50':>9} {'p95':>9}")
+    for label, s in sorted(summary["recorded"].items()):
+        print(f"{label:<40} {s['count']:>5} {s['p50_ms']:>8.1f}ms {s['p95_ms']:>8.1f}ms")
+    if summary["skipped"]:
+        print(f"\nnot replayed: {json.dumps(summary['skipped'], ensure_ascii=False)}")
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(summary, baseline, args.tolerance, args.min_delta_ms, args.min_count)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Drive scripted multi-player game sessions against the real app.
+
+    uv run python -m bench.run --games 16 --concurrency 8 --turns 6 --profile realistic --latency-scale 0.05
+
+各ゲームは 作成 → アバター生成 → N ターン (合間に GET /game/{id} をポーリング)
+→ 写真一覧 → 告発 の順に進む。--burst K を指定するとターンは K 枚連写の
+POST /game/{id}/turn/burst になる。結果はエンドポイントごとの p50/p95/p99、
+スループット、ピーク RSS として表示され、--json で保存できる。
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+from pathlib import Path
+
+from bench.fakes import PROFILES, FakeBackends, LatencyModel, make_png, make_profile
+from bench.harness import BenchClient, Recorder, bench_client, format_summary, install_fakes
+
+
+async def play_game(client: BenchClient, args: argparse.Namespace, rng: random.Random, photo: bytes) -> None:
+    res = await client.request("POST /game/", "POST", "/game/", json={"player_name": f"bench-{rng.getrandbits(24):06x}"})
+    game_id = res.json()["id"]
+
+    if not args.no_avatar:
+        await client.request("POST /game/{id}/avatar", "POST", f"/game/{game_id}/avatar")
+
+    remaining = None
+    etag = None  # ブラウザと同じく If-None-Match で再検証する
+    for _ in range(args.turns):
+        for _ in range(args.polls_per_turn):
+            headers = {"If-None-Match": etag} if etag else {}
+            res = await client.request("GET /game/{id}", "GET", f"/game/{game_id}", headers=headers)
+            etag = res.headers.get("etag", etag)
+        if args.burst:
+            res = await client.request(
+                "POST /game/{id}/turn/burst",
+                "POST",
+                f"/game/{game_id}/turn/burst",
+                files=[("files", (f"photo{i}.jpg", photo, "image/jpeg")) for i in range(args.burst)],
+            )
+        else:
+            res = await client.request(
+                "POST /game/{id}/turn",
+                "POST",
+                f"/game/{game_id}/turn",
+                files={"file": ("photo.jpg", photo, "image/jpeg")},
+            )
+        if res.status_code == 200:
+            remaining = res.json()["items_remaining"]
+            if not remaining:
+                break
+        elif res.status_code == 400:
+            break
+        if args.think_time:
+            await asyncio.sleep(rng.uniform(0, args.think_time))
+
+    await client.request("GET /game/{id}/photos/", "GET", f"/game/{game_id}/photos/")
+
+    if remaining == []:
+        await client.request(
+            "POST /game/{id}/accuse",
+            "POST",
+            f"/game/{game_id}/accuse",
+            json={"suspect_name": "bench", "reason": "bench"},
+        )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    profile = make_profile(
+        args.profile,
+        latency_scale=args.latency_scale,
+        rate_limit_rate=args.rate_limit_rate,
+        detect_hit_rate=args.detect_hit_rate,
+        malformed_text_rate=args.malformed_text_rate,
+        image_size=args.image_size,
+        seed=args.seed,
+    )
+    for spec in args.gemini_latency:
+        model, _, latency = spec.partition("=")
+        profile.gemini_models[model] = LatencyModel.parse(latency)
+
+    backends = FakeBackends.create(profile)
+    app = install_fakes(backends)
+    photo = make_png(args.photo_size, seed=args.seed + 1)
+
+    recorder = Recorder()
+    sem = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+
+    async with bench_client(app, recorder) as client:
+
+        async def session(i: int) -> None:
+            async with sem:
+                await play_game(client, args, random.Random(rng.getrandbits(32) + i), photo)
+
+        await asyncio.gather(*(session(i) for i in range(args.games)))
+
+    summary = recorder.summary()
+    summary["backends"] = {
+        "firestore_reads": backends.db.reads,
+        "firestore_writes": backends.db.writes,
+        "gcs_bytes_uploaded": backends.bucket.bytes_uploaded,
+        "gcs_bytes_downloaded": backends.bucket.bytes_downloaded,
+        "gemini_calls": backends.genai.calls,
+        "gemini_rate_limited": backends.genai.rate_limited,
+        "gemini_bytes_inline": backends.genai.bytes_inline,
+        "gemini_bytes_uploaded": backends.genai.bytes_uploaded,
+    }
+    from app import metrics
+
+    summary["turn_engines"] = {name: stats.snapshot() for name, stats in metrics.turn_engines.items()}
+    summary["image_models"] = {name: stats.snapshot() for name, stats in metrics.models.items()}
+    return summary
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4, help="同時に進行するゲーム数")
+    parser.add_argument("--turns", type=int, default=6, help="1 ゲームあたりの最大ターン数")
+    parser.add_argument("--polls-per-turn", type=int, default=2, help="ターン間の GET /game/{id} 回数")
+    parser.add_argument("--burst", type=int, default=0, help="1 ターンで連写する枚数 (0 なら通常のターン)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="ターン間の最大待ち時間 (秒)")
+    parser.add_argument("--no-avatar", action="store_true")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="zero")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="全レイテンシに掛ける係数")
+    parser.add_argument(
+        "--gemini-latency",
+        action="append",
+        default=[],
+        metavar="MODEL=MEDIAN[:P95]",
+        help="モデルごとのレイテンシ (ms) を上書き",
+    )
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Gemini 呼び出しが 429 になる確率")
+    parser.add_argument("--detect-hit-rate", type=float, default=0.6)
+    parser.add_argument("--malformed-text-rate", type=float, default=0.0, help="統合ターンの判定テキストが壊れる確率")
+    parser.add_argument("--image-size", type=int, default=512, help="生成画像の一辺 (px)")
+    parser.add_argument("--photo-size", type=int, default=640, help="アップロード写真の一辺 (px)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="結果を JSON で保存するパス")
+    parser.add_argument("--verbose", action="store_true", help="app のログ (例外トレース) を表示")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    summary = asyncio.run(run(args))
+    print(format_summary(summary))
+    print()
+    print(json.dumps(summary["backends"], ensure_ascii=False))
+    print(json.dumps(summary["turn_engines"], ensure_ascii=False))
+    print(json.dumps(summary["image_models"], ensure_ascii=False))
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
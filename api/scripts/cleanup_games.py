@@ -0,0 +1,65 @@
+"""Delete games past their retention period, plus stale uploads/ objects.
+
+Usage:
+    uv run python scripts/cleanup_games.py --dry-run
+    uv run python scripts/cleanup_games.py --checkpoint /tmp/retention.json
+"""
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import retention  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="count only, delete nothing")
+    parser.add_argument("--checkpoint", type=Path, help="resume from / save progress to this JSON file")
+    parser.add_argument("--solved-days", type=float, default=retention.RETENTION_SOLVED_DAYS)
+    parser.add_argument("--abandoned-days", type=float, default=retention.RETENTION_ABANDONED_DAYS)
+    parser.add_argument("--uploads-days", type=float, default=retention.RETENTION_UPLOADS_DAYS)
+    parser.add_argument("--max-games", type=int, help="stop after this many games (resume with --checkpoint)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    policy = retention.RetentionPolicy(
+        solved_days=args.solved_days,
+        abandoned_days=args.abandoned_days,
+        uploads_days=args.uploads_days,
+    )
+    report = retention.run(
+        policy, dry_run=args.dry_run, checkpoint=args.checkpoint, max_games=args.max_games
+    )
+
+    if args.json:
+        print(json.dumps({**asdict(report), "throughput": report.throughput()}, indent=2))
+        return
+
+    verb = "would delete" if report.dry_run else "deleted"
+    print(f"scanned {report.games_scanned} games, {verb} {report.games_deleted}")
+    print(
+        f"  {report.blobs_deleted} blobs ({report.bytes_deleted / 1_000_000:.1f} MB), "
+        f"{report.docs_deleted} docs, {report.uploads_deleted} stale uploads"
+    )
+    rates = report.throughput()
+    print(
+        f"  {report.elapsed_s:.1f}s: {rates['games_per_s']:.1f} games/s, "
+        f"{rates['blobs_per_s']:.1f} blobs/s, {rates['docs_per_s']:.1f} docs/s, "
+        f"{rates['mb_per_s']:.2f} MB/s"
+    )
+    if not report.finished:
+        print(f"  stopped early at {report.cursor}; rerun with the same --checkpoint to resume")
+    for error in report.errors:
+        print(f"  error: {error}", file=sys.stderr)
+    if report.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 import axios from 'axios'
 import { getGameAPI } from './endpoints/gameAPI'
 
+export const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api'
+
 const apiClient = axios.create({
-  baseURL: import.meta.env.VITE_API_BASE_URL || '/api',
+  baseURL: API_BASE_URL,
 })
 
 export const api = getGameAPI(apiClient)
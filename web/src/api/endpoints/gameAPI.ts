@@ -15,9 +15,11 @@ import type {
   AccusationRequest,
   AccusationResponse,
   AvatarResponse,
+  BodyPlayBurstTurnGameGameIdTurnBurstPost,
   BodyPlayTurnGameGameIdTurnPost,
   BodyUploadFileStorageUploadPost,
   BodyUploadPhotoGameGameIdPhotosPost,
+  BurstTurnResponse,
   GameCreateRequest,
   GameResponse,
   GameUpdateRequest,
@@ -25,9 +27,13 @@ import type {
   GenerateImageResponse,
   GenerateRequest,
   GenerateResponse,
+  GetTimelineStateGameGameIdTimelineStateGetParams,
   HintMessage,
+  ListTimelineGameGameIdTimelineGetParams,
   PhotoListResponse,
   PhotoResponse,
+  TimelineResponse,
+  TimelineStateResponse,
   TurnResponse
 } from '../model';
 
@@ -71,6 +77,18 @@ const updateGameGameGameIdPatch = (
     );
   }
 
+/**
+ * ゲームの写真・幽霊画像と写真レコードの manifest.json を ZIP でストリーム配信する。
+ * @summary Export Game
+ */
+const exportGameGameGameIdExportGet = (
+    gameId: string, options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<unknown>> => {
+    return axiosInstance.get(
+      `/game/${gameId}/export`,options
+    );
+  }
+
 /**
  * ghost_description からアバター画像を生成し GCS に保存する。
  * @summary Generate Avatar
@@ -109,6 +127,22 @@ const generateGeminiGeneratePost = (
     );
   }
 
+/**
+ * 生成中のテキストを Server-Sent Events で逐次返す。
+ * 
+ * チャンクごとに `data: {"text": ...}`、完了時に `event: done` (全文) を送る。
+ * クライアントが切断したら Gemini へのストリームを閉じて生成を打ち切る。
+ * @summary Generate Stream
+ */
+const generateStreamGeminiGenerateStreamPost = (
+    generateRequest: GenerateRequest, options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<unknown>> => {
+    return axiosInstance.post(
+      `/gemini/generate/stream`,
+      generateRequest,options
+    );
+  }
+
 /**
  * @summary Generate Image
  */
@@ -218,6 +252,54 @@ const getHintMessageScenarioHintsItemGet = (
     );
   }
 
+/**
+ * イベントログを時系列順に返す。next_cursor を after に渡すと続きを取得できる。
+ * @summary List Timeline
+ */
+const listTimelineGameGameIdTimelineGet = (
+    gameId: string,
+    params?: ListTimelineGameGameIdTimelineGetParams, options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<TimelineResponse>> => {
+    return axiosInstance.get(
+      `/game/${gameId}/timeline/`,{
+    ...options,
+        params: {...params, ...options?.params},}
+    );
+  }
+
+/**
+ * イベント at 時点のゲーム状態をスナップショットとイベントログから復元する。
+ * 
+ * at が最初のイベントより前なら、ゲーム作成前の空の状態を返す。
+ * イベントログ導入前に作られたゲームは過去の状態を復元できないので 409 を返す。
+ * @summary Get Timeline State
+ */
+const getTimelineStateGameGameIdTimelineStateGet = (
+    gameId: string,
+    params: GetTimelineStateGameGameIdTimelineStateGetParams, options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<TimelineStateResponse>> => {
+    return axiosInstance.get(
+      `/game/${gameId}/timeline/state`,{
+    ...options,
+        params: {...params, ...options?.params},}
+    );
+  }
+
+/**
+ * ゲームの変更を Server-Sent Events で配信する。
+ * 
+ * 接続直後に現在の状態を `event: state` で送り、以降はイベントログに追記された
+ * イベントを `event: <type>` (id はイベント ID) で送る。ポーリングの代わりに使う。
+ * @summary Stream Timeline
+ */
+const streamTimelineGameGameIdTimelineStreamGet = (
+    gameId: string, options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<unknown>> => {
+    return axiosInstance.get(
+      `/game/${gameId}/timeline/stream`,options
+    );
+  }
+
 /**
  * @summary Play Turn
  */
@@ -233,6 +315,25 @@ formData.append(`file`, bodyPlayTurnGameGameIdTurnPost.file);
     );
   }
 
+/**
+ * 連写した複数枚の写真で 1 ターンを行う。
+ * 
+ * 全フレームを 1 回の Vision リクエストで判定し、最も確信度の高いフレームだけを
+ * 保存して幽霊を合成する。
+ * @summary Play Burst Turn
+ */
+const playBurstTurnGameGameIdTurnBurstPost = (
+    gameId: string,
+    bodyPlayBurstTurnGameGameIdTurnBurstPost: BodyPlayBurstTurnGameGameIdTurnBurstPost, options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<BurstTurnResponse>> => {const formData = new FormData();
+bodyPlayBurstTurnGameGameIdTurnBurstPost.files.forEach(value => formData.append(`files`, value));
+
+    return axiosInstance.post(
+      `/game/${gameId}/turn/burst`,
+      formData,options
+    );
+  }
+
 /**
  * @summary Health
  */
@@ -244,13 +345,27 @@ const healthHealthGet = (
     );
   }
 
-return {createGameGamePost,getGameGameGameIdGet,updateGameGameGameIdPatch,generateAvatarGameGameIdAvatarPost,accuseGameGameIdAccusePost,generateGeminiGeneratePost,generateImageGeminiGenerateImagePost,uploadFileStorageUploadPost,getSignedUrlStorageUrlPathGet,uploadPhotoGameGameIdPhotosPost,listPhotosGameGameIdPhotosGet,getPhotoGameGameIdPhotosPhotoIdGet,generateGhostGameGameIdPhotosPhotoIdGhostPost,listHintMessagesEndpointScenarioHintsGet,getHintMessageScenarioHintsItemGet,playTurnGameGameIdTurnPost,healthHealthGet}};
+/**
+ * ターンエンジンの A/B 比較用カウンタなど (プロセス単位)。
+ * @summary Get Metrics
+ */
+const getMetricsMetricsGet = (
+     options?: AxiosRequestConfig
+ ): Promise<AxiosResponse<unknown>> => {
+    return axiosInstance.get(
+      `/metrics`,options
+    );
+  }
+
+return {createGameGamePost,getGameGameGameIdGet,updateGameGameGameIdPatch,exportGameGameGameIdExportGet,generateAvatarGameGameIdAvatarPost,accuseGameGameIdAccusePost,generateGeminiGeneratePost,generateStreamGeminiGenerateStreamPost,generateImageGeminiGenerateImagePost,uploadFileStorageUploadPost,getSignedUrlStorageUrlPathGet,uploadPhotoGameGameIdPhotosPost,listPhotosGameGameIdPhotosGet,getPhotoGameGameIdPhotosPhotoIdGet,generateGhostGameGameIdPhotosPhotoIdGhostPost,listHintMessagesEndpointScenarioHintsGet,getHintMessageScenarioHintsItemGet,listTimelineGameGameIdTimelineGet,getTimelineStateGameGameIdTimelineStateGet,streamTimelineGameGameIdTimelineStreamGet,playTurnGameGameIdTurnPost,playBurstTurnGameGameIdTurnBurstPost,healthHealthGet,getMetricsMetricsGet}};
 export type CreateGameGamePostResult = AxiosResponse<GameResponse>
 export type GetGameGameGameIdGetResult = AxiosResponse<GameResponse>
 export type UpdateGameGameGameIdPatchResult = AxiosResponse<GameResponse>
+export type ExportGameGameGameIdExportGetResult = AxiosResponse<unknown>
 export type GenerateAvatarGameGameIdAvatarPostResult = AxiosResponse<AvatarResponse>
 export type AccuseGameGameIdAccusePostResult = AxiosResponse<AccusationResponse>
 export type GenerateGeminiGeneratePostResult = AxiosResponse<GenerateResponse>
+export type GenerateStreamGeminiGenerateStreamPostResult = AxiosResponse<unknown>
 export type GenerateImageGeminiGenerateImagePostResult = AxiosResponse<GenerateImageResponse>
 export type UploadFileStorageUploadPostResult = AxiosResponse<unknown>
 export type GetSignedUrlStorageUrlPathGetResult = AxiosResponse<unknown>
@@ -260,5 +375,10 @@ export type GetPhotoGameGameIdPhotosPhotoIdGetResult = AxiosResponse<PhotoRespon
 export type GenerateGhostGameGameIdPhotosPhotoIdGhostPostResult = AxiosResponse<PhotoResponse>
 export type ListHintMessagesEndpointScenarioHintsGetResult = AxiosResponse<HintMessage[]>
 export type GetHintMessageScenarioHintsItemGetResult = AxiosResponse<HintMessage>
+export type ListTimelineGameGameIdTimelineGetResult = AxiosResponse<TimelineResponse>
+export type GetTimelineStateGameGameIdTimelineStateGetResult = AxiosResponse<TimelineStateResponse>
+export type StreamTimelineGameGameIdTimelineStreamGetResult = AxiosResponse<unknown>
 export type PlayTurnGameGameIdTurnPostResult = AxiosResponse<TurnResponse>
+export type PlayBurstTurnGameGameIdTurnBurstPostResult = AxiosResponse<BurstTurnResponse>
 export type HealthHealthGetResult = AxiosResponse<unknown>
+export type GetMetricsMetricsGetResult = AxiosResponse<unknown>
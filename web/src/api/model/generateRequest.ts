@@ -8,4 +8,5 @@
 export interface GenerateRequest {
   prompt: string;
   model?: string;
+  temperature?: number | null;
 }
@@ -8,9 +8,11 @@
 export * from './accusationRequest';
 export * from './accusationResponse';
 export * from './avatarResponse';
+export * from './bodyPlayBurstTurnGameGameIdTurnBurstPost';
 export * from './bodyPlayTurnGameGameIdTurnPost';
 export * from './bodyUploadFileStorageUploadPost';
 export * from './bodyUploadPhotoGameGameIdPhotosPost';
+export * from './burstTurnResponse';
 export * from './gameCreateRequest';
 export * from './gameResponse';
 export * from './gameUpdateRequest';
@@ -18,10 +20,16 @@ export * from './generateImageRequest';
 export * from './generateImageResponse';
 export * from './generateRequest';
 export * from './generateResponse';
+export * from './getTimelineStateGameGameIdTimelineStateGetParams';
 export * from './hintMessage';
 export * from './hTTPValidationError';
+export * from './listTimelineGameGameIdTimelineGetParams';
 export * from './photoListResponse';
 export * from './photoResponse';
+export * from './timelineEvent';
+export * from './timelineEventData';
+export * from './timelineResponse';
+export * from './timelineStateResponse';
 export * from './turnResponse';
 export * from './validationError';
 export * from './validationErrorCtx';
\ No newline at end of file
@@ -0,0 +1,15 @@
+/**
+ * Generated by orval v8.4.1 🍺
+ * Do not edit manually.
+ * Game API
+ * OpenAPI spec version: 0.1.0
+ */
+
+export type ListTimelineGameGameIdTimelineGetParams = {
+after?: string | null;
+/**
+ * @minimum 1
+ * @maximum 500
+ */
+limit?: number;
+};
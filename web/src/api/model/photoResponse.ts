@@ -12,6 +12,11 @@ export interface PhotoResponse {
   ghost_url?: string | null;
   ghost_gesture?: string | null;
   ghost_message?: string | null;
+  ghost_model?: string | null;
   detected_item?: string | null;
+  thumbnail_url?: string | null;
+  preview_url?: string | null;
+  ghost_thumbnail_url?: string | null;
+  ghost_preview_url?: string | null;
   created_at: string;
 }
@@ -0,0 +1,14 @@
+/**
+ * Generated by orval v8.4.1 🍺
+ * Do not edit manually.
+ * Game API
+ * OpenAPI spec version: 0.1.0
+ */
+import type { TimelineEventData } from './timelineEventData';
+
+export interface TimelineEvent {
+  id: string;
+  type: string;
+  data?: TimelineEventData;
+  created_at: string;
+}
@@ -0,0 +1,8 @@
+/**
+ * Generated by orval v8.4.1 🍺
+ * Do not edit manually.
+ * Game API
+ * OpenAPI spec version: 0.1.0
+ */
+
+export type TimelineEventData = { [key: string]: unknown };
@@ -0,0 +1,12 @@
+/**
+ * Generated by orval v8.4.1 🍺
+ * Do not edit manually.
+ * Game API
+ * OpenAPI spec version: 0.1.0
+ */
+import type { TimelineEvent } from './timelineEvent';
+
+export interface TimelineResponse {
+  events: TimelineEvent[];
+  next_cursor?: string | null;
+}
@@ -0,0 +1,14 @@
+/**
+ * Generated by orval v8.4.1 🍺
+ * Do not edit manually.
+ * Game API
+ * OpenAPI spec version: 0.1.0
+ */
+
+export interface TimelineStateResponse {
+  event_id: string;
+  status?: string | null;
+  photo_count?: number;
+  avatar_url?: string | null;
+  cleared_items?: string[];
+}
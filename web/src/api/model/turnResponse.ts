@@ -12,6 +12,7 @@ export interface TurnResponse {
   detected_item?: string | null;
   ghost_url?: string | null;
   ghost_message?: string | null;
+  ghost_model?: string | null;
   cleared_items: string[];
   items_remaining: string[];
   game_status: string;
@@ -1,6 +1,6 @@
-import { createContext, useContext, useEffect, useState, useCallback, type ReactNode } from 'react'
-import { api } from '../api/client'
-import type { AccusationResponse, TurnResponse } from '../api/model'
+import { createContext, useContext, useEffect, useRef, useState, useCallback, type ReactNode } from 'react'
+import { api, API_BASE_URL } from '../api/client'
+import type { AccusationResponse, GameResponse, TurnResponse } from '../api/model'
 
 interface HintInfo {
   item: string
@@ -31,6 +31,20 @@ const GameContext = createContext<GameContextValue | null>(null)
 
 const LS_GAME_ID = 'ghost_whisper_game_id'
 
+interface GhostReadyEvent {
+  detected_item?: string | null
+  ghost_url?: string | null
+}
+
+function addHint(hints: HintInfo[], item: string, message: string, ghostUrl: string | null): HintInfo[] {
+  const existing = hints.find((h) => h.item === item)
+  if (existing) {
+    if (existing.ghostUrl || !ghostUrl) return hints
+    return hints.map((h) => (h.item === item ? { ...h, ghostUrl } : h))
+  }
+  return [...hints, { item, message, ghostUrl }]
+}
+
 async function restoreHintsFromServer(gameId: string): Promise<{ avatarUrl: string | null; hints: HintInfo[]; clearedItems: string[]; gameSolved: boolean }> {
   const [gameRes, photosRes, hintsRes] = await Promise.all([
     api.getGameGameGameIdGet(gameId),
@@ -69,10 +83,63 @@ export function GameProvider({ children }: { children: ReactNode }) {
     hideBottomNav: false,
   })
 
+  const hintMessagesRef = useRef<Record<string, string>>({})
+
   const setHideBottomNav = useCallback((hide: boolean) => {
     setState((s) => ({ ...s, hideBottomNav: hide }))
   }, [])
 
+  // サーバーからの変更通知 (SSE) でゲーム状態を同期する。ポーリングはしない
+  useEffect(() => {
+    const gameId = state.gameId
+    if (!gameId) return
+
+    api.listHintMessagesEndpointScenarioHintsGet().then((res) => {
+      for (const h of res.data) hintMessagesRef.current[h.item] = h.message
+    }).catch(() => { /* ヒント文は turn のレスポンスからも得られる */ })
+
+    const source = new EventSource(`${API_BASE_URL}/game/${gameId}/timeline/stream`)
+
+    source.addEventListener('state', (e) => {
+      const game = JSON.parse((e as MessageEvent).data) as GameResponse
+      setState((s) => ({
+        ...s,
+        avatarUrl: game.avatar_url ?? s.avatarUrl,
+        clearedItems: game.cleared_items ?? s.clearedItems,
+        gameSolved: s.gameSolved || game.status === 'solved',
+      }))
+    })
+    source.addEventListener('item_cleared', (e) => {
+      const { item } = JSON.parse((e as MessageEvent).data) as { item: string }
+      setState((s) => (
+        s.clearedItems.includes(item) ? s : { ...s, clearedItems: [...s.clearedItems, item] }
+      ))
+    })
+    source.addEventListener('ghost_ready', (e) => {
+      const data = JSON.parse((e as MessageEvent).data) as GhostReadyEvent
+      const item = data.detected_item
+      if (!item) return
+      setState((s) => ({
+        ...s,
+        hints: addHint(s.hints, item, hintMessagesRef.current[item] ?? '', data.ghost_url ?? null),
+      }))
+    })
+    source.addEventListener('avatar_ready', (e) => {
+      const { avatar_url } = JSON.parse((e as MessageEvent).data) as { avatar_url: string }
+      setState((s) => ({ ...s, avatarUrl: avatar_url }))
+    })
+    source.addEventListener('accusation_made', (e) => {
+      const { correct } = JSON.parse((e as MessageEvent).data) as { correct: boolean }
+      if (correct) setState((s) => ({ ...s, gameSolved: true }))
+    })
+    source.addEventListener('status_changed', (e) => {
+      const { status } = JSON.parse((e as MessageEvent).data) as { status: string }
+      if (status === 'solved') setState((s) => ({ ...s, gameSolved: true }))
+    })
+
+    return () => source.close()
+  }, [state.gameId])
+
   useEffect(() => {
     let cancelled = false
 
@@ -136,21 +203,20 @@ export function GameProvider({ children }: { children: ReactNode }) {
 
   const updateFromTurn = useCallback((turn: TurnResponse) => {
     setState((prev) => {
-      const hints = [...prev.hints]
+      let hints = prev.hints
       if (turn.detected_item && turn.hint_message) {
-        const exists = hints.some((h) => h.item === turn.detected_item)
-        if (!exists) {
-          hints.push({
-            item: turn.detected_item,
-            message: turn.hint_message,
-            ghostUrl: turn.ghost_url ?? null,
-          })
-        }
+        // 変更通知 (ghost_ready) が先に届いていた場合はヒント文だけ補う
+        hints = addHint(
+          hints.map((h) => (h.item === turn.detected_item && !h.message ? { ...h, message: turn.hint_message } : h)),
+          turn.detected_item,
+          turn.hint_message,
+          turn.ghost_url ?? null,
+        )
       }
 
       return {
         ...prev,
-        clearedItems: turn.cleared_items,
+        clearedItems: Array.from(new Set([...prev.clearedItems, ...turn.cleared_items])),
         hints,
       }
     })